@@ -9,12 +9,37 @@
 
 import random
 import os
+import re
+import shutil
+import atexit
+import bisect
+import contextlib
 import datetime
+import gzip
+import io
 import json
+import lzma
+import mmap
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import accumulate
+import numpy as np
 import folder_paths
 import csv
 import yaml
 import xml.etree.ElementTree as ET
+from array import array
+from types import MappingProxyType
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 # ============================================================================
@@ -22,7 +47,11 @@ import xml.etree.ElementTree as ET
 # ============================================================================
 
 
-def _get_log_file_path(save_log_path, log_file_name, output_dir):
+# Extensions of the log files written by MF_LogFile (text and JSONL formats)
+_LOG_EXTENSIONS = (".txt", ".jsonl")
+
+
+def _get_log_file_path(save_log_path, log_file_name, output_dir, extension=".txt"):
     """Helper to normalize log file path and name."""
     if save_log_path is None or save_log_path.strip() == "":
         save_log_path = output_dir
@@ -30,15 +59,539 @@ def _get_log_file_path(save_log_path, log_file_name, output_dir):
     if log_file_name is None or log_file_name.strip() == "":
         log_file_name = "logfile"
 
-    if not log_file_name.lower().endswith(".txt"):
-        log_file_name += ".txt"
+    if not log_file_name.lower().endswith(_LOG_EXTENSIONS):
+        log_file_name += extension
 
     return os.path.join(save_log_path, log_file_name)
 
 
-def _normalize_text_lines(text):
-    """Normalize line endings and split text into lines."""
-    return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+# Start of a log entry written by MF_LogFile ("[2025-10-22 14:30:15] ...")
+_LOG_ENTRY_START = re.compile(r"\n\n(?=\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\] )")
+
+
+def _split_log_entries(text):
+    """Split MF_LogFile content into entries, each ending with its blank line."""
+    if not text:
+        return []
+    parts = _LOG_ENTRY_START.split(text)
+    return [part + "\n\n" for part in parts[:-1]] + [parts[-1]]
+
+
+def _split_jsonl_entries(text):
+    """Split JSONL content into records, each ending with its newline."""
+    return re.findall(r"[^\n]*\n|[^\n]+$", text)
+
+
+def _read_log_tail(path, max_entries, max_bytes=0, block_size=64 * 1024):
+    """
+    Read the last max_entries entries of a log file (at most about max_bytes
+    when > 0) by seeking backwards from the end in blocks, so the cost does
+    not depend on the size of the file. Entries of .jsonl files are lines.
+    """
+    if path.lower().endswith(".jsonl"):
+        separator, split = b"\n", _split_jsonl_entries
+    else:
+        separator, split = b"\n\n[", _split_log_entries
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = pos = f.tell()
+        data = b""
+
+        while pos > 0 and data.count(separator) <= max_entries:
+            if max_bytes > 0 and end - pos >= max_bytes:
+                break
+            step = min(block_size, pos)
+            if max_bytes > 0:
+                step = min(step, max_bytes - (end - pos))
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+
+    entries = split(data.decode("utf-8", errors="replace"))
+    if pos > 0 and entries:
+        # The first entry was probably cut by the seek
+        entries = entries[1:]
+    return entries[-max_entries:]
+
+
+def _rotated_log_segments(path, with_keys=False):
+    """
+    Rotated segments of a log file, oldest first. Segments are named
+    "<name>.<YYYYMMDD-HHMMSS>[-N].<ext>", optionally followed by ".gz" or
+    ".xz". While a segment is being compressed both copies may exist; the
+    uncompressed one is listed. With with_keys, (key, path) pairs are
+    returned, the key ordering segments and staying the same once the
+    segment is compressed.
+    """
+    directory, file_name = os.path.split(os.path.abspath(path))
+    stem, ext = os.path.splitext(file_name)
+    pattern = re.compile(
+        re.escape(stem)
+        + r"\.(\d{8}-\d{6})(?:-(\d+))?"
+        + re.escape(ext)
+        + r"(\.gz|\.xz)?$"
+    )
+    if not os.path.isdir(directory):
+        return []
+
+    segments = {}
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if not match:
+            continue
+        key = (match.group(1), int(match.group(2) or 0))
+        if key not in segments or not match.group(3):
+            segments[key] = os.path.join(directory, name)
+    if with_keys:
+        return [(key, segments[key]) for key in sorted(segments)]
+    return [segments[key] for key in sorted(segments)]
+
+
+def _file_fingerprint(path):
+    """Cheap change fingerprint of a file: (size, mtime, inode) from one stat."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}"
+
+
+def _read_complete_lines(f, offset, complete_lines=True):
+    """
+    Read a binary file from offset to its end, returning (text, new offset).
+    With complete_lines, a trailing partial line is left for the next read.
+    """
+    f.seek(offset)
+    data = f.read()
+    if complete_lines:
+        data = data[: data.rfind(b"\n") + 1]
+    return data.decode("utf-8", errors="replace"), offset + len(data)
+
+
+def _log_end_position(path):
+    """Position at the current end of path, for _read_new_lines."""
+    segments = _rotated_log_segments(path, with_keys=True)
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, segments[-1][0] if segments else None
+
+
+def _read_new_lines(path, position=None):
+    """
+    Read the complete lines appended to path since position, as returned
+    by a previous call (None = from the start): the inode and offset read
+    up to, and the key of the newest rotated segment at the time. A
+    truncated file is read again from the start.
+
+    Rotations are detected by name rather than by inode, since compression
+    frees the inode of a segment and the next file may reuse it: the first
+    segment newer than that key is the file read last, and is read past
+    the offset (decompressing it if needed), followed by any newer
+    segments. Returns (text, new position).
+    """
+    parts = []
+
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        segments = _rotated_log_segments(path, with_keys=True)
+        if position is None:
+            position = (stat.st_ino, 0, segments[-1][0] if segments else None)
+        inode, offset, last_key = position
+
+        rotated = False
+        newer = [s for s in segments if last_key is None or s[0] > last_key]
+        for number, (key, segment) in enumerate(newer):
+            try:
+                if os.stat(segment).st_ino == stat.st_ino:
+                    # The open file itself, rotated out just now: it is
+                    # read below and found again on the next call
+                    break
+            except OSError:
+                pass
+            try:
+                with _open_log_segment(segment, binary=True) as old:
+                    if number == 0:
+                        # Compressed files seek in their decompressed data
+                        old.seek(offset)
+                    data = old.read()
+                parts.append(data.decode("utf-8", errors="replace"))
+            except (OSError, EOFError, lzma.LZMAError) as e:
+                print(f"⚠️ [MF_LogReader] Could not read {segment}: {e}")
+            last_key = key
+            rotated = True
+
+        if rotated or (not newer and inode != stat.st_ino):
+            # Rotated, or replaced without rotation: the file is new
+            offset = 0
+        elif stat.st_size < offset:
+            # Truncated: start over
+            offset = 0
+
+        text, offset = _read_complete_lines(f, offset)
+        parts.append(text)
+
+    return "".join(parts), (stat.st_ino, offset, last_key)
+
+
+def _open_log_segment(path, binary=False):
+    """Open a (possibly gzip/xz compressed) log segment for reading text."""
+    mode, encoding = ("rb", None) if binary else ("rt", "utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding=encoding)
+    if path.endswith(".xz"):
+        return lzma.open(path, mode, encoding=encoding)
+    try:
+        return open(path, mode.replace("t", ""), encoding=encoding)
+    except FileNotFoundError:
+        # Compressed (and removed) since the segments were listed
+        for suffix in (".gz", ".xz"):
+            if os.path.exists(path + suffix):
+                return _open_log_segment(path + suffix, binary)
+        raise
+
+
+def _read_log_index(path):
+    """
+    Read the sparse time index of a JSONL log (its ".idx" sidecar): sorted
+    (timestamp, byte offset) pairs, one per INDEX_INTERVAL bytes of log.
+    """
+    index = []
+    try:
+        # A damaged index only loses its unreadable entries
+        with open(path + ".idx", "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                timestamp, _, offset = line.rstrip("\n").rpartition(" ")
+                if timestamp and offset.isdigit():
+                    index.append((timestamp, int(offset)))
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def _format_jsonl_record(now, level, project, step, log_entry):
+    """
+    Format a JSONL log record, returning (line, timestamp). The timestamp
+    comes first, in fixed-width ISO format, so records can be compared by
+    their timestamp without being parsed. An entry holding a JSON object or
+    array is stored as such in payload, anything else as a string.
+    """
+    timestamp = now.isoformat(timespec="milliseconds")
+    payload = log_entry
+    if log_entry.strip().startswith(("{", "[")):
+        try:
+            payload = json.loads(log_entry)
+        except ValueError:
+            pass
+
+    record = {
+        "timestamp": timestamp,
+        "level": level,
+        "project": project or None,
+        "step": step if step >= 0 else None,
+        "payload": payload,
+    }
+    return json.dumps(record) + "\n", timestamp
+
+
+def _count_newlines(buffer, start, end, chunk_size=1024 * 1024):
+    """Count the newlines of buffer[start:end], copying one chunk at a time."""
+    count = 0
+    for pos in range(start, end, chunk_size):
+        count += buffer[pos : min(pos + chunk_size, end)].count(b"\n")
+    return count
+
+
+def _search_log_lines(path, regex, context_lines=0, max_results=100):
+    """
+    Yield (line_number, is_match, line) for the lines of path matching the
+    compiled bytes regex, with up to context_lines lines around each match
+    (as grep -C), until max_results matching lines. None separates groups
+    of lines that are not adjacent. The file is memory-mapped and searched
+    in place; only the yielded lines are copied.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            pos = 0  # End of the last yielded line
+            line_number = 1  # Number of the line starting at pos
+            results = 0
+
+            while results < max_results and pos < size:
+                match = regex.search(mm, pos)
+                if match is None:
+                    break
+
+                # Start of the matching line, then of its context
+                start = first = mm.rfind(b"\n", 0, match.start()) + 1
+                for _ in range(context_lines):
+                    if first <= pos:
+                        break
+                    first = mm.rfind(b"\n", 0, first - 1) + 1
+                first = max(first, pos)
+
+                if pos and first > pos and context_lines:
+                    yield None
+                line_number += _count_newlines(mm, pos, first)
+
+                # Context before the match
+                line_start = first
+                while line_start < start:
+                    end = mm.find(b"\n", line_start)
+                    yield line_number, False, mm[line_start:end]
+                    line_number += 1
+                    line_start = end + 1
+
+                # The match, then the context after it (extended by matches)
+                is_match = True
+                remaining = context_lines
+                while True:
+                    end = mm.find(b"\n", line_start)
+                    end = size if end < 0 else end
+                    yield line_number, is_match, mm[line_start:end]
+                    line_number += 1
+                    line_start = end + 1
+
+                    if is_match:
+                        results += 1
+                        remaining = context_lines
+                    else:
+                        remaining -= 1
+                    if line_start >= size or remaining <= 0:
+                        break
+
+                    # After the last result, only its context is yielded
+                    end = mm.find(b"\n", line_start)
+                    end = size if end < 0 else end
+                    is_match = (
+                        results < max_results
+                        and regex.search(mm, line_start, end) is not None
+                    )
+
+                pos = min(line_start, size)
+
+
+# Record levels in increasing severity
+_LOG_LEVELS = ("debug", "info", "warning", "error")
+# Where a JSONL record's timestamp sits: after '{"timestamp": "'
+_JSONL_TIMESTAMP = slice(15, 38)
+
+
+def _parse_query_time(value):
+    """Parse a time bound ("2025-10-22 14:30", ISO...) to the record format."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value).isoformat(timespec="milliseconds")
+
+
+def _segment_end_time(segment):
+    """
+    Latest record time a rotated segment can hold: segments are stamped
+    with their last write or rotation time. None if the name has no stamp.
+    """
+    match = re.search(r"\.(\d{8}-\d{6})(?:-\d+)?\.", os.path.basename(segment))
+    if not match:
+        return None
+    stamp = datetime.datetime.strptime(match.group(1), "%Y%m%d-%H%M%S")
+    return stamp.replace(microsecond=999000).isoformat(timespec="milliseconds")
+
+
+def _scan_jsonl_records(lines, start, end, filters, needles, max_results, results):
+    """
+    Append to results the JSONL lines (bytes) timestamped within [start,
+    end] whose record matches filters ({field: allowed values}). Lines not
+    containing every needle are skipped without being parsed. Returns False
+    once a record past end is seen (records are written in time order) or
+    max_results are collected.
+    """
+    for line in lines:
+        timestamp = line[_JSONL_TIMESTAMP].decode("ascii", errors="replace")
+        if start and timestamp < start:
+            continue
+        if end and timestamp > end:
+            return False
+        if not all(needle in line for needle in needles):
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if any(record.get(field) not in allowed for field, allowed in filters.items()):
+            continue
+
+        results.append(line.decode("utf-8", errors="replace"))
+        if len(results) >= max_results:
+            return False
+    return True
+
+
+def _parse_beats(beats, node_name="MF_ShotHelper"):
+    """
+    Parse beat points ("3,8,15", one per line, or "[3,8,15]") into a
+    sorted list of integers. Invalid input yields an empty list.
+    """
+    if not beats.strip():
+        return []
+
+    try:
+        # Remove array brackets if present
+        beats_clean = beats.strip()
+        if beats_clean.startswith("[") and beats_clean.endswith("]"):
+            beats_clean = beats_clean[1:-1]
+
+        # Replace newlines with commas for unified parsing
+        beats_clean = beats_clean.replace("\n", ",")
+
+        # Split by comma and parse integers
+        return sorted([int(b.strip()) for b in beats_clean.split(",") if b.strip()])
+    except ValueError:
+        print(f"⚠️ [{node_name}] Invalid beats format '{beats}'. Using empty beats.")
+        return []
+
+
+def _sequence_shot(step, beat_list):
+    """
+    Return (sequence_num, shot_num) of a step: sequences increment at each
+    beat of the sorted beat_list, and shots restart at 1 in each sequence.
+    """
+    passed = bisect.bisect_right(beat_list, step)
+    shot_start = beat_list[passed - 1] if passed else 0
+    return passed + 1, step - shot_start + 1
+
+
+def _first_value(value, default):
+    """Unwrap a single value from an INPUT_IS_LIST argument."""
+    if isinstance(value, list):
+        return value[0] if value else default
+    return default if value is None else value
+
+
+def _lttb_indices(x_values, y_values, threshold):
+    """
+    Pick `threshold` point indices with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points, and from each bucket in between the
+    point forming the largest triangle with the previously selected point
+    and the average of the next bucket. Per-bucket work is vectorized with
+    NumPy so the cost stays low for large histories. Missing (NaN) values
+    are treated as 0.
+    """
+    n = len(x_values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n, dtype=np.int64)
+
+    x = np.asarray(x_values, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y_values, dtype=np.float64))
+
+    # Bucket boundaries for the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area for every candidate in the bucket
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def _json_floats(values):
+    """Convert a float array to a JSON-safe list (NaN gaps become None)."""
+    return [None if v != v else v for v in values]
+
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _step_seed(project_seed, step):
+    """
+    Derive the seed of one step from the project seed, statelessly.
+
+    Counter-based: this is output number `step` of a SplitMix64 generator
+    seeded with project_seed, computed directly in O(1) without generating
+    the previous outputs. Any worker can therefore compute the seed of any
+    step with no shared state, and the result is always reproducible.
+    """
+    z = (project_seed + (step + 1) * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+# ============================================================================
+# SHARED STATE
+# ============================================================================
+
+
+class _SharedState:
+    """
+    Copy-on-write mapping for class-level node state shared by the prompt
+    executor, aiohttp handlers and background threads.
+
+    Writers serialize on `lock` and publish a modified copy of the mapping
+    instead of changing it in place, so get() and snapshot() never need
+    the lock: a snapshot is an immutable view that cannot change while it
+    is iterated or serialized. Values that are themselves mutable must only
+    be changed, or copied for reading, while holding `lock`.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._data = {}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def snapshot(self):
+        """Immutable view of the current mapping."""
+        return MappingProxyType(self._data)
+
+    def set(self, key, value):
+        with self.lock:
+            data = dict(self._data)
+            data[key] = value
+            self._data = data
+
+    def pop(self, key, default=None):
+        with self.lock:
+            if key not in self._data:
+                return default
+            data = dict(self._data)
+            value = data.pop(key)
+            self._data = data
+            return value
+
+    def update(self, key, function, default=None):
+        """Atomically set key to function(current value) and return it."""
+        with self.lock:
+            value = function(self._data.get(key, default))
+            self.set(key, value)
+            return value
 
 
 # ============================================================================
@@ -100,6 +653,79 @@ class MF_DiceRoller:
         }
 
 
+# ============================================================================
+# TEXT LINES
+# ============================================================================
+
+
+class _TextLines:
+    """
+    A text with normalized line endings and the offsets of its line starts,
+    so a line is selected by slicing instead of splitting the whole text.
+
+    Parsed texts are kept in a bounded LRU cache shared by MF_LineCounter
+    and MF_LineSelect, keyed by hash(text) (which Python caches on the
+    string object) and checked against the text itself, so a prompt list
+    re-used across executions is only split once.
+    """
+
+    MAX_CACHED = 64
+    MAX_CACHED_CHARS = 64 * 1024 * 1024
+
+    # Key format: hash(text) -> _TextLines, least recently used first
+    _cache = OrderedDict()
+    _cached_chars = 0
+    _lock = threading.Lock()
+
+    def __init__(self, source):
+        self.source = source
+        self.text = source.replace("\r\n", "\n").replace("\r", "\n")
+        self.starts = array(
+            "q",
+            accumulate(
+                (len(line) + 1 for line in self.text.split("\n")[:-1]), initial=0
+            ),
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line(self, index):
+        start = self.starts[index]
+        if index + 1 < len(self.starts):
+            return self.text[start : self.starts[index + 1] - 1]
+        return self.text[start:]
+
+    @classmethod
+    def get(cls, text):
+        """Get the parsed lines of text, from the cache when possible."""
+        key = hash(text)
+        with cls._lock:
+            entry = cls._cache.get(key)
+            if entry is not None and (entry.source is text or entry.source == text):
+                cls._cache.move_to_end(key)
+                return entry
+
+        entry = cls(text)
+
+        with cls._lock:
+            old = cls._cache.pop(key, None)
+            if old is not None:
+                cls._cached_chars -= len(old.text)
+            cls._cache[key] = entry
+            cls._cached_chars += len(entry.text)
+
+            # Always keep the newest entry, even if it alone is too large
+            while len(cls._cache) > 1 and (
+                len(cls._cache) > cls.MAX_CACHED
+                or cls._cached_chars > cls.MAX_CACHED_CHARS
+            ):
+                _, old = cls._cache.popitem(last=False)
+                cls._cached_chars -= len(old.text)
+
+        return entry
+
+
 # ============================================================================
 # LINE COUNTER
 # ============================================================================
@@ -130,11 +756,10 @@ class MF_LineCounter:
 
     def count_lines(self, text):
         """Count the number of lines in the input text."""
-        if not text.strip():
+        if not text or text.isspace():
             return (0, "0")
 
-        lines = _normalize_text_lines(text)
-        line_count = len(lines)
+        line_count = len(_TextLines.get(text))
 
         return (line_count, str(line_count))
 
@@ -157,7 +782,10 @@ class MF_LineSelect:
         return {
             "required": {
                 "text": ("STRING", {"multiline": True}),
-                "line_index": ("INT", {"default": 0, "min": 0, "max": 1000, "step": 1}),
+                "line_index": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 0xFFFFFFFF, "step": 1},
+                ),
             },
         }
 
@@ -167,14 +795,14 @@ class MF_LineSelect:
 
     def select_line(self, text, line_index):
         """Select a specific line from the input text based on index."""
-        lines = _normalize_text_lines(text)
+        lines = _TextLines.get(text)
 
         if line_index < 0 or line_index >= len(lines):
             error_msg = f"⚠️ Line index {line_index} out of range (0-{len(lines) - 1})"
             print(f"[MF_LineSelect] {error_msg}")
             return (error_msg,)
 
-        return (lines[line_index],)
+        return (lines.line(line_index),)
 
 
 # ============================================================================
@@ -182,12 +810,391 @@ class MF_LineSelect:
 # ============================================================================
 
 
+class _LogWriter:
+    """
+    Background writer for log files.
+
+    write() only queues the text; a worker thread drains the queue, groups
+    the queued entries by path and appends each group with a single write,
+    through an LRU pool of open append handles, so logging in a loop pays
+    no open/close or directory creation per entry. Every batch is flushed
+    to the OS, making it visible to readers; handles written since their
+    last fsync are fsynced every fsync_interval seconds, or right away for
+    entries queued with durable=True.
+
+    Entries may carry a rotation policy (mode, max_bytes, keep, compression):
+    before a batch is written, a file that is due (mode "size": the batch
+    would take it past max_bytes; mode "daily": it was last written on an
+    earlier day) is renamed to a timestamped segment, which is compressed
+    with gzip or xz and pruned to the newest `keep` segments in another
+    background thread.
+
+    Entries queued with an index_time (JSONL records) are also indexed: every
+    INDEX_INTERVAL bytes, the (index_time, byte offset) of the next entry is
+    appended to the file's ".idx" sidecar, which is dropped on rotation.
+    """
+
+    # Bytes of log between two entries of its sparse time index
+    INDEX_INTERVAL = 64 * 1024
+
+    def __init__(self, max_open_files=32, fsync_interval=5.0, max_batch=1024):
+        self.max_open_files = max_open_files
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        # path -> open append handle, least recently used first
+        self._handles = OrderedDict()
+        # Paths written since their last fsync
+        self._unsynced = set()
+        # path -> (stamp, counter) of its last rotated segment
+        self._last_segment = {}
+        # path -> last write time of a daily rotation that failed
+        self._rotation_due = {}
+        # path -> byte offset from which the next entry is indexed
+        self._next_index = {}
+        # path -> last write error not yet reported by take_error()
+        self._errors = {}
+        # Rotated segments waiting for compression and pruning
+        self._segments = queue.Queue()
+        self._compressor = None
+        self._last_fsync = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="MF_LogFile-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(
+        self, path, text, wait=False, durable=False, rotation=None, index_time=None
+    ):
+        """
+        Queue text to be appended to path. With wait, block until it has
+        been written (and fsynced, with durable).
+        """
+        done = threading.Event() if wait or durable else None
+        self._queue.put(
+            (os.path.abspath(path), text, durable, done, rotation, index_time)
+        )
+        if done is not None:
+            done.wait()
+
+    def flush(self):
+        """Block until every queued entry has been written."""
+        self._queue.join()
+
+    def take_error(self, path):
+        """Pop the last error writing path since the previous call, if any."""
+        return self._errors.pop(os.path.abspath(path), None)
+
+    def close(self):
+        """Write pending entries and close all handles (at exit)."""
+        self.flush()
+        self._queue.put(None)
+        self._queue.join()
+
+    def _handle(self, path):
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # No newline translation: sizes and index offsets are counted in
+        # encoded bytes, which "\r\n" on Windows would shift
+        handle = open(path, "a", encoding="utf-8", newline="")
+        self._handles[path] = handle
+        while len(self._handles) > self.max_open_files:
+            old_path, old_handle = self._handles.popitem(last=False)
+            self._close_handle(old_path, old_handle)
+        return handle
+
+    def _close_handle(self, path, handle):
+        try:
+            if path in self._unsynced:
+                handle.flush()
+                os.fsync(handle.fileno())
+                self._unsynced.discard(path)
+            handle.close()
+        except Exception as e:
+            print(f"❌ [MF_LogFile] Error closing {path}: {e}")
+
+    def _append(self, path, text, index_points=()):
+        handle = self._handle(path)
+        handle.write(text)
+        handle.flush()
+        self._unsynced.add(path)
+
+        # Indexed only once the entries are written, so the index never
+        # points past the end of the log
+        if index_points:
+            with open(path + ".idx", "a", encoding="utf-8", newline="") as f:
+                f.write("".join(f"{t} {offset}\n" for t, offset in index_points))
+
+    def _index_offset(self, path, size):
+        """Byte offset from which the next entry of path is indexed."""
+        if path not in self._next_index:
+            index = _read_log_index(path)
+            if index and index[-1][1] >= size:
+                # Left over from a log that was since truncated or replaced
+                os.remove(path + ".idx")
+                index = []
+            self._next_index[path] = index[-1][1] + self.INDEX_INTERVAL if index else 0
+        return self._next_index[path]
+
+    def _write_batch(self, path, entries, rotation):
+        """
+        Append (text, index_time) entries to path in as few writes as
+        possible, rotating the file first when it is due. With size rotation
+        the batch is split so that no segment grows past max_bytes (unless a
+        single entry does).
+        """
+        mode, max_bytes, keep, compression = rotation or ("none", 0, 0, "none")
+
+        try:
+            stat = os.stat(path)
+            size = stat.st_size
+        except FileNotFoundError:
+            size = 0
+
+        if mode == "daily" and size:
+            last_write = self._rotation_due.pop(
+                path, datetime.datetime.fromtimestamp(stat.st_mtime)
+            )
+            if last_write.date() != datetime.date.today():
+                if self._rotate(path, last_write, keep, compression):
+                    size = 0
+                else:
+                    # Retried on the next batch, although written today
+                    self._rotation_due[path] = last_write
+
+        chunk = []
+        chunk_bytes = 0
+        index_points = []
+        rotate = mode == "size"
+        for text, index_time in entries:
+            length = len(text.encode("utf-8"))
+            written = size + chunk_bytes
+            if rotate and written and written + length > max_bytes:
+                if chunk:
+                    self._append(path, "".join(chunk), index_points)
+                size += chunk_bytes
+                chunk_bytes = 0
+                chunk = []
+                index_points = []
+                if self._rotate(path, datetime.datetime.now(), keep, compression):
+                    size = written = 0
+                else:
+                    # Keep appending to the current file; the next batch
+                    # retries the rotation
+                    rotate = False
+            if index_time is not None and written >= self._index_offset(path, size):
+                index_points.append((index_time, written))
+                self._next_index[path] = written + self.INDEX_INTERVAL
+            chunk.append(text)
+            chunk_bytes += length
+
+        if chunk:
+            self._append(path, "".join(chunk), index_points)
+
+    def _rotate(self, path, last_write, keep, compression):
+        """
+        Rename path to a segment stamped with last_write, then compress and
+        prune segments in the background. Returns False, leaving path in
+        place, if it cannot be renamed (e.g. open in a reader on Windows).
+        """
+        handle = self._handles.pop(path, None)
+        if handle is not None:
+            self._close_handle(path, handle)
+
+        # Segments rotated within the same second get increasing counters,
+        # so their names keep sorting in rotation order
+        stem, ext = os.path.splitext(path)
+        stamp = last_write.strftime("%Y%m%d-%H%M%S")
+        last_stamp, counter = self._last_segment.get(path, (None, -1))
+        counter = counter + 1 if stamp == last_stamp else 0
+        while True:
+            segment = (
+                f"{stem}.{stamp}-{counter}{ext}" if counter else f"{stem}.{stamp}{ext}"
+            )
+            if not any(
+                os.path.exists(segment + suffix) for suffix in ("", ".gz", ".xz")
+            ):
+                break
+            counter += 1
+
+        try:
+            os.replace(path, segment)
+        except OSError as e:
+            print(f"⚠️ [MF_LogFile] Could not rotate {path}, will retry: {e}")
+            return False
+        self._last_segment[path] = (stamp, counter)
+        print(f"🔁 [MF_LogFile] Rotated {os.path.basename(path)}")
+
+        # The time index only covers the current file
+        self._next_index[path] = 0
+        if os.path.exists(path + ".idx"):
+            os.remove(path + ".idx")
+
+        if self._compressor is None:
+            self._compressor = threading.Thread(
+                target=self._run_compressor, name="MF_LogFile-compress", daemon=True
+            )
+            self._compressor.start()
+        self._segments.put((path, segment, keep, compression))
+        return True
+
+    def _run_compressor(self):
+        """Compress and prune rotated segments one at a time."""
+        while True:
+            self._finish_segment(*self._segments.get())
+
+    @staticmethod
+    def _finish_segment(path, segment, keep, compression):
+        """Compress a rotated segment, then prune old segments of path."""
+        try:
+            # Already pruned when more segments were rotated than are kept
+            if compression in ("gzip", "xz") and os.path.exists(segment):
+                suffix = ".gz" if compression == "gzip" else ".xz"
+                opener = gzip.open if compression == "gzip" else lzma.open
+                tmp_path = segment + suffix + ".tmp"
+                with open(segment, "rb") as src, opener(tmp_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.replace(tmp_path, segment + suffix)
+                os.remove(segment)
+
+            if keep > 0:
+                for old_segment in _rotated_log_segments(path)[:-keep]:
+                    os.remove(old_segment)
+        except OSError as e:
+            print(f"⚠️ [MF_LogFile] Could not compress/prune {segment}: {e}")
+
+    def _fsync(self, paths):
+        for path in paths:
+            handle = self._handles.get(path)
+            if handle is not None:
+                os.fsync(handle.fileno())
+            self._unsynced.discard(path)
+
+    def _write_items(self, items, closing):
+        """Write a batch of queued items, grouped by path, then fsync."""
+        batches = OrderedDict()
+        for item in items:
+            if item is not None:
+                batches.setdefault(item[0], []).append(item)
+
+        durable_paths = set()
+        for path, batch in batches.items():
+            try:
+                self._write_batch(
+                    path, [(item[1], item[5]) for item in batch], batch[-1][4]
+                )
+                if any(item[2] for item in batch):
+                    durable_paths.add(path)
+            except Exception as e:
+                # Any error only loses this batch, never the writer thread
+                print(f"❌ [MF_LogFile] Error writing {path}: {e}")
+                self._errors[path] = str(e)
+                handle = self._handles.pop(path, None)
+                if handle is not None:
+                    try:
+                        handle.close()
+                    except Exception:
+                        pass
+
+        try:
+            if closing or (
+                self._unsynced
+                and time.monotonic() - self._last_fsync >= self.fsync_interval
+            ):
+                self._fsync(list(self._unsynced))
+                self._last_fsync = time.monotonic()
+            elif durable_paths:
+                self._fsync(durable_paths)
+        except Exception as e:
+            print(f"❌ [MF_LogFile] Error syncing log files: {e}")
+
+        if closing:
+            for path, handle in list(self._handles.items()):
+                self._close_handle(path, handle)
+            self._handles.clear()
+
+    def _run(self):
+        while True:
+            try:
+                items = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                items = []
+            while items and len(items) < self.max_batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            closing = any(item is None for item in items)
+            try:
+                self._write_items(items, closing)
+            finally:
+                # Whatever happened, never leave a waiting write(), flush()
+                # or close() blocked on these entries
+                for item in items:
+                    if item is not None and item[3] is not None:
+                        item[3].set()
+                    self._queue.task_done()
+
+            if closing:
+                return
+
+
+class _LogTail:
+    """
+    Bounded in-memory tail of a log file: its last entries, up to
+    max_entries and (when > 0) max_bytes of UTF-8 text.
+    """
+
+    def __init__(self, max_entries, max_bytes=0):
+        self.entries = deque()
+        self.size = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_file(cls, path, max_entries, max_bytes=0):
+        """Seed a tail from the end of an existing log file."""
+        tail = cls(max_entries, max_bytes)
+        if os.path.exists(path):
+            for entry in _read_log_tail(path, max_entries, max_bytes):
+                tail.append(entry)
+        return tail
+
+    def append(self, entry):
+        self.entries.append(entry)
+        self.size += len(entry.encode("utf-8"))
+        self._trim()
+
+    def _trim(self):
+        # Always keep the newest entry, even if it alone exceeds max_bytes
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_entries
+            or (self.max_bytes > 0 and self.size > self.max_bytes)
+        ):
+            self.size -= len(self.entries.popleft().encode("utf-8"))
+
+    def text(self):
+        return "".join(self.entries)
+
+
 class MF_LogFile:
     """
     A ComfyUI node that writes timestamped log entries to a text file.
     v1.5.1: Fixed subfolder support by copying MF_SaveData's path handling
     """
 
+    # Class variable holding the in-memory tail of each log file written
+    # Key format: absolute log file path -> _LogTail
+    _tails = _SharedState()
+    # Background writer shared by all MF_LogFile nodes
+    _writer = None
+
     CATEGORY = "MF_PipoNodes/Logging"
 
     def __init__(self):
@@ -204,6 +1211,36 @@ class MF_LogFile:
             "optional": {
                 "save_log_path": ("STRING", {"default": "output"}),
                 "log_file_name": ("STRING", {"default": "logfile"}),
+                "output_mode": (["tail", "new_entry", "full_file"],),
+                "tail_entries": (
+                    "INT",
+                    {"default": 100, "min": 1, "max": 100000, "step": 1},
+                ),
+                "tail_kb": (
+                    "INT",
+                    {"default": 64, "min": 0, "max": 65536, "step": 1},
+                ),
+                "durability": (["buffered", "flush", "fsync"],),
+                "rotation": (["none", "size", "daily"],),
+                "max_size_kb": (
+                    "INT",
+                    {"default": 10240, "min": 1, "max": 16777216, "step": 1},
+                ),
+                "keep_segments": (
+                    "INT",
+                    {"default": 10, "min": 0, "max": 10000, "step": 1},
+                ),
+                "compression": (["gzip", "xz", "none"],),
+                "log_format": (["text", "jsonl"],),
+                "level": (["info", "debug", "warning", "error"],),
+                "project": ("STRING", {"default": ""}),
+                "step": (
+                    "INT",
+                    {"default": -1, "min": -1, "max": 0xFFFFFFFF, "step": 1},
+                ),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             },
         }
 
@@ -216,8 +1253,64 @@ class MF_LogFile:
     def IS_CHANGED(cls, **kwargs):
         return float("nan")
 
-    def write_log(self, log_entry, save_log_path="output", log_file_name="logfile"):
-        """Write a timestamped log entry to file."""
+    @classmethod
+    def get_writer(cls):
+        """Get or start the background log writer"""
+        if cls._writer is None:
+            cls._writer = _LogWriter()
+        return cls._writer
+
+    @classmethod
+    def get_tail(cls, log_file_path, max_entries, max_bytes=0):
+        """
+        Get the in-memory tail of a log file, seeding it from the end of the
+        file the first time (or when its size limits change)
+        """
+        key = os.path.abspath(log_file_path)
+        tail = cls._tails.get(key)
+        if (
+            tail is None
+            or tail.max_entries != max_entries
+            or tail.max_bytes != max_bytes
+        ):
+            # Queued entries must be on disk before reading the file back
+            cls.get_writer().flush()
+            tail = _LogTail.from_file(key, max_entries, max_bytes)
+            cls._tails.set(key, tail)
+        return tail
+
+    def write_log(
+        self,
+        log_entry,
+        save_log_path="output",
+        log_file_name="logfile",
+        output_mode="tail",
+        tail_entries=100,
+        tail_kb=64,
+        durability="buffered",
+        rotation="none",
+        max_size_kb=10240,
+        keep_segments=10,
+        compression="gzip",
+        log_format="text",
+        level="info",
+        project="",
+        step=-1,
+        unique_id=None,
+    ):
+        """
+        Write a timestamped log entry to file.
+        Returns the last tail_entries entries (within tail_kb KB, 0 = no size
+        limit), only the new entry, or the whole file, per output_mode.
+        The entry is written by a background thread: durability "buffered"
+        returns at once, "flush" waits until it is written and "fsync"
+        until it is on disk. A failed background write is reported by the
+        next execution writing to the same file. With rotation "size" or "daily" the file is
+        rolled into compressed segments, keeping keep_segments (0 = all).
+        With log_format "jsonl", each entry is one JSON record (timestamp,
+        level, project, step, payload) in a .jsonl file with a sparse time
+        index, queryable with MF_LogQuery.
+        """
         try:
             # Normalize inputs (same as before)
             if save_log_path is None or save_log_path.strip() == "":
@@ -226,29 +1319,61 @@ class MF_LogFile:
             if log_file_name is None or log_file_name.strip() == "":
                 log_file_name = "logfile"
 
-            # Create output directory if it doesn't exist (SAME AS MF_SaveData)
-            os.makedirs(save_log_path, exist_ok=True)
-
-            # Add .txt extension if needed
-            if not log_file_name.lower().endswith(".txt"):
-                log_file_name += ".txt"
+            # Add .txt (or .jsonl) extension if needed
+            if not log_file_name.lower().endswith(_LOG_EXTENSIONS):
+                log_file_name += ".jsonl" if log_format == "jsonl" else ".txt"
 
             # Build full filepath (SAME AS MF_SaveData pattern)
             log_file_path = os.path.join(save_log_path, log_file_name)
+            MF_LogReader.remember_path(unique_id, log_file_path)
 
             # Format entry with timestamp
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            formatted_entry = f"[{timestamp}] {log_entry}\n\n"
-
-            # Write new entry (append mode to preserve log history)
-            with open(log_file_path, "a", encoding="utf-8") as f:
-                f.write(formatted_entry)
+            now = datetime.datetime.now()
+            index_time = None
+            if log_format == "jsonl":
+                formatted_entry, index_time = _format_jsonl_record(
+                    now, level, project, step, log_entry
+                )
+            else:
+                timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+                formatted_entry = f"[{timestamp}] {log_entry}\n\n"
+
+            # Seed the tail before writing, so the new entry is not read back
+            tail = self.get_tail(log_file_path, tail_entries, tail_kb * 1024)
+
+            # Queue new entry (the writer appends and creates the output
+            # directory if it doesn't exist)
+            writer = self.get_writer()
+            writer.write(
+                log_file_path,
+                formatted_entry,
+                wait=durability != "buffered",
+                durable=durability == "fsync",
+                rotation=(rotation, max_size_kb * 1024, keep_segments, compression),
+                index_time=index_time,
+            )
 
-            # Read entire log for display
-            with open(log_file_path, "r", encoding="utf-8") as f:
-                self.last_log_content = f.read()
+            # Entries are written in the background: report a failure on
+            # the next execution (or this one, when waiting for the write)
+            error = writer.take_error(log_file_path)
+            if error is not None:
+                # The tail may hold entries that never reached the file
+                self._tails.pop(os.path.abspath(log_file_path))
+                raise OSError(error)
+
+            tail.append(formatted_entry)
+
+            if output_mode == "new_entry":
+                self.last_log_content = formatted_entry
+            elif output_mode == "full_file":
+                # Explicit opt-in: read the entire log
+                writer.flush()
+                with open(log_file_path, "r", encoding="utf-8") as f:
+                    self.last_log_content = f.read()
+            else:
+                self.last_log_content = tail.text()
 
-            print(f"📝 [MF_LogFile] Wrote entry to {log_file_path}")
+            print(f"📝 [MF_LogFile] Logged entry to {log_file_path}")
 
             return {
                 "ui": {
@@ -278,6 +1403,13 @@ class MF_LogReader:
     A ComfyUI node that reads and displays log file content with live updates.
     """
 
+    # Class variable remembering how far each node has read each file in
+    # follow mode. Key format: (node_id, absolute path) -> (inode, offset)
+    _follow = _SharedState()
+    # Class variable holding the log file each node last opened, used by
+    # the live log watcher. Key format: node_id -> absolute path
+    _opened_paths = _SharedState()
+
     CATEGORY = "MF_PipoNodes/Logging"
 
     def __init__(self):
@@ -294,6 +1426,11 @@ class MF_LogReader:
                     {"default": folder_paths.get_output_directory()},
                 ),
                 "log_file_name": ("STRING", {"default": "logfile"}),
+                "include_rotated": ("BOOLEAN", {"default": False}),
+                "follow": ("BOOLEAN", {"default": False}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             },
         }
 
@@ -303,17 +1440,78 @@ class MF_LogReader:
     OUTPUT_NODE = True
 
     @classmethod
-    def IS_CHANGED(cls, **kwargs):
-        return float("nan")
+    def IS_CHANGED(cls, log_file_path=None, log_file_name=None, **kwargs):
+        # Re-execute only when the log file changes (one stat() per prompt)
+        full_path = _get_log_file_path(
+            log_file_path, log_file_name, folder_paths.get_output_directory()
+        )
+        return _file_fingerprint(full_path)
+
+    @classmethod
+    def read_new_content(cls, full_path, node_id="default"):
+        """
+        Return the complete lines appended to full_path since the last call
+        for node_id, tracking the file's inode and read offset
+        """
+        key = (str(node_id), os.path.abspath(full_path))
+        content, position = _read_new_lines(full_path, cls._follow.get(key))
+        cls._follow.set(key, position)
+        return content
+
+    @classmethod
+    def remember_path(cls, node_id, full_path):
+        """Record the log file a MF_LogReader/MF_LogFile node last opened"""
+        if node_id is not None:
+            cls._opened_paths.set(str(node_id), os.path.abspath(full_path))
 
-    def read_log(self, log_file_path=None, log_file_name=None):
-        """Read log file content and display it in the node."""
+    @classmethod
+    def opened_path(cls, node_id):
+        """Get the log file a node last opened, or None"""
+        return cls._opened_paths.get(str(node_id))
+
+    def read_log(
+        self,
+        log_file_path=None,
+        log_file_name=None,
+        include_rotated=False,
+        follow=False,
+        unique_id=None,
+    ):
+        """
+        Read log file content and display it in the node.
+        With include_rotated, rotated (possibly compressed) segments are
+        read first, oldest to newest, followed by the current file.
+        With follow, only the lines appended since this node's last read
+        are returned.
+        """
         full_path = _get_log_file_path(log_file_path, log_file_name, self.output_dir)
+        self.remember_path(unique_id, full_path)
 
         try:
+            if follow and os.path.exists(full_path):
+                content = self.read_new_content(full_path, unique_id or "default")
+
+                print(
+                    f"📖 [MF_LogReader] Read {len(content)} new characters from {os.path.basename(full_path)}"
+                )
+
+                return {
+                    "ui": {
+                        "log_display": [content],
+                    },
+                    "result": (content,),
+                }
+
+            segments = _rotated_log_segments(full_path) if include_rotated else []
             if os.path.exists(full_path):
-                with open(full_path, "r", encoding="utf-8") as f:
-                    content = f.read()
+                segments.append(full_path)
+
+            if segments:
+                parts = []
+                for segment in segments:
+                    with _open_log_segment(segment) as f:
+                        parts.append(f.read())
+                content = "".join(parts)
 
                 print(
                     f"📖 [MF_LogReader] Read {len(content)} characters from {os.path.basename(full_path)}"
@@ -346,25 +1544,336 @@ class MF_LogReader:
 
 
 # ============================================================================
-# MODULO
+# LOG SEARCH
 # ============================================================================
 
 
-class MF_Modulo:
+class MF_LogSearch:
     """
-    A ComfyUI node that applies modulo operation to an integer input
-    and displays the result directly in the node.
+    A ComfyUI node that outputs only the lines of a log or text file that
+    match a substring or regex, with optional context lines.
     """
 
-    CATEGORY = "MF_PipoNodes/Math"
+    CATEGORY = "MF_PipoNodes/Logging"
+
+    def __init__(self):
+        self.output_dir = folder_paths.get_output_directory()
+        self.type = "output"
 
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "input_number": (
+                "pattern": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                "log_file_path": (
+                    "STRING",
+                    {"default": folder_paths.get_output_directory()},
+                ),
+                "log_file_name": ("STRING", {"default": "logfile"}),
+                "mode": (["substring", "regex"],),
+                "ignore_case": ("BOOLEAN", {"default": False}),
+                "context_lines": (
                     "INT",
-                    {"default": 0, "min": -999999, "max": 999999, "step": 1},
+                    {"default": 0, "min": 0, "max": 1000, "step": 1},
+                ),
+                "max_results": (
+                    "INT",
+                    {"default": 100, "min": 1, "max": 1000000, "step": 1},
+                ),
+                "line_numbers": ("BOOLEAN", {"default": False}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("matches", "match_count")
+    FUNCTION = "search_log"
+    OUTPUT_NODE = True
+
+    @classmethod
+    def IS_CHANGED(cls, log_file_path=None, log_file_name=None, **kwargs):
+        full_path = cls.get_path(
+            log_file_path, log_file_name, folder_paths.get_output_directory()
+        )
+        return _file_fingerprint(full_path)
+
+    @staticmethod
+    def get_path(log_file_path, log_file_name, output_dir):
+        """Resolve the searched file; any file with an extension is kept as is."""
+        has_extension = bool(os.path.splitext((log_file_name or "").strip())[1])
+        return _get_log_file_path(
+            log_file_path, log_file_name, output_dir, "" if has_extension else ".txt"
+        )
+
+    def search_log(
+        self,
+        pattern,
+        log_file_path=None,
+        log_file_name=None,
+        mode="substring",
+        ignore_case=False,
+        context_lines=0,
+        max_results=100,
+        line_numbers=False,
+    ):
+        """
+        Search a log file and display the matching lines in the node.
+        Context lines are separated from non-adjacent groups by "--" and,
+        with line_numbers, prefixed "N-" instead of "N:" (as grep does).
+        """
+        full_path = self.get_path(log_file_path, log_file_name, self.output_dir)
+
+        try:
+            if not pattern:
+                raise ValueError("pattern is required")
+
+            if not os.path.exists(full_path):
+                error_msg = f"⚠️ Log file not found: {full_path}"
+                print(f"[MF_LogSearch] {error_msg}")
+                return {
+                    "ui": {
+                        "log_display": [error_msg],
+                    },
+                    "result": (error_msg, 0),
+                }
+
+            source = pattern.encode("utf-8")
+            if mode == "substring":
+                source = re.escape(source)
+            flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+            regex = re.compile(source, flags)
+
+            lines = []
+            match_count = 0
+            for item in _search_log_lines(full_path, regex, context_lines, max_results):
+                if item is None:
+                    lines.append("--")
+                    continue
+                line_number, is_match, line = item
+                text = line.decode("utf-8", errors="replace").rstrip("\r")
+                if line_numbers:
+                    text = f"{line_number}{':' if is_match else '-'}{text}"
+                lines.append(text)
+                match_count += is_match
+
+            content = "\n".join(lines)
+
+            print(
+                f"🔎 [MF_LogSearch] Found {match_count} matching lines in {os.path.basename(full_path)}"
+            )
+
+            return {
+                "ui": {
+                    "log_display": [content],
+                },
+                "result": (content, match_count),
+            }
+        except Exception as e:
+            error_message = f"❌ Error searching log file: {str(e)}"
+            print(f"[MF_LogSearch] {error_message}")
+            return {
+                "ui": {
+                    "log_display": [error_message],
+                },
+                "result": (error_message, 0),
+            }
+
+
+# ============================================================================
+# LOG QUERY
+# ============================================================================
+
+
+class MF_LogQuery:
+    """
+    A ComfyUI node that queries a JSONL log written by MF_LogFile by time
+    window, project, step and level.
+    """
+
+    CATEGORY = "MF_PipoNodes/Logging"
+
+    def __init__(self):
+        self.output_dir = folder_paths.get_output_directory()
+        self.type = "output"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {},
+            "optional": {
+                "log_file_path": (
+                    "STRING",
+                    {"default": folder_paths.get_output_directory()},
+                ),
+                "log_file_name": ("STRING", {"default": "logfile"}),
+                "start_time": ("STRING", {"default": ""}),
+                "end_time": ("STRING", {"default": ""}),
+                "project": ("STRING", {"default": ""}),
+                "step": (
+                    "INT",
+                    {"default": -1, "min": -1, "max": 0xFFFFFFFF, "step": 1},
+                ),
+                "min_level": (list(_LOG_LEVELS),),
+                "max_results": (
+                    "INT",
+                    {"default": 1000, "min": 1, "max": 1000000, "step": 1},
+                ),
+                "include_rotated": ("BOOLEAN", {"default": False}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("records", "record_count")
+    FUNCTION = "query_log"
+    OUTPUT_NODE = True
+
+    @classmethod
+    def IS_CHANGED(cls, log_file_path=None, log_file_name=None, **kwargs):
+        full_path = _get_log_file_path(
+            log_file_path, log_file_name, folder_paths.get_output_directory(), ".jsonl"
+        )
+        return _file_fingerprint(full_path)
+
+    @staticmethod
+    def query(
+        full_path,
+        start=None,
+        end=None,
+        project="",
+        step=-1,
+        min_level="debug",
+        max_results=1000,
+        include_rotated=False,
+    ):
+        """
+        Return the matching JSONL lines of full_path, oldest first. With a
+        start time, reading begins at the closest point of the sparse time
+        index instead of the start of the file, and rotated segments that
+        end before it are skipped; reading stops at the first record past
+        the end time.
+        """
+        filters = {}
+        needles = []
+        if project:
+            filters["project"] = {project}
+            needles.append(b'"project": ' + json.dumps(project).encode("utf-8"))
+        if step >= 0:
+            filters["step"] = {step}
+            needles.append(b'"step": %d,' % step)
+        if min_level != _LOG_LEVELS[0]:
+            filters["level"] = set(_LOG_LEVELS[_LOG_LEVELS.index(min_level) :])
+
+        results = []
+        scan = (start, end, filters, needles, max_results, results)
+
+        segments = _rotated_log_segments(full_path) if include_rotated else []
+        for segment in segments:
+            segment_end = _segment_end_time(segment)
+            if start and segment_end and segment_end < start:
+                continue
+            with _open_log_segment(segment, binary=True) as f:
+                if not _scan_jsonl_records(f, *scan):
+                    return results
+
+        if os.path.exists(full_path):
+            offset = 0
+            if start:
+                index = _read_log_index(full_path)
+                position = bisect.bisect_left(index, (start,)) - 1
+                if position >= 0:
+                    offset = index[position][1]
+
+            with open(full_path, "rb") as f:
+                f.seek(offset)
+                _scan_jsonl_records(f, *scan)
+
+        return results
+
+    def query_log(
+        self,
+        log_file_path=None,
+        log_file_name=None,
+        start_time="",
+        end_time="",
+        project="",
+        step=-1,
+        min_level="debug",
+        max_results=1000,
+        include_rotated=False,
+    ):
+        """
+        Query a JSONL log and display the matching records in the node.
+        Times are local ISO dates ("2025-10-22 14:30"), empty for no bound.
+        """
+        full_path = _get_log_file_path(
+            log_file_path, log_file_name, self.output_dir, ".jsonl"
+        )
+
+        try:
+            if not os.path.exists(full_path) and not include_rotated:
+                error_msg = f"⚠️ Log file not found: {full_path}"
+                print(f"[MF_LogQuery] {error_msg}")
+                return {
+                    "ui": {
+                        "log_display": [error_msg],
+                    },
+                    "result": (error_msg, 0),
+                }
+
+            records = self.query(
+                full_path,
+                _parse_query_time(start_time),
+                _parse_query_time(end_time),
+                project.strip(),
+                step,
+                min_level,
+                max_results,
+                include_rotated,
+            )
+            content = "".join(records)
+
+            print(
+                f"🔎 [MF_LogQuery] Found {len(records)} records in {os.path.basename(full_path)}"
+            )
+
+            return {
+                "ui": {
+                    "log_display": [content],
+                },
+                "result": (content, len(records)),
+            }
+        except Exception as e:
+            error_message = f"❌ Error querying log file: {str(e)}"
+            print(f"[MF_LogQuery] {error_message}")
+            return {
+                "ui": {
+                    "log_display": [error_message],
+                },
+                "result": (error_message, 0),
+            }
+
+
+# ============================================================================
+# MODULO
+# ============================================================================
+
+
+class MF_Modulo:
+    """
+    A ComfyUI node that applies modulo operation to an integer input
+    and displays the result directly in the node.
+    """
+
+    CATEGORY = "MF_PipoNodes/Math"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "input_number": (
+                    "INT",
+                    {"default": 0, "min": -999999, "max": 999999, "step": 1},
                 ),
                 "modulo_value": (
                     "INT",
@@ -533,40 +2042,10 @@ class MF_ShotHelper:
                    shot_name format: "seq01_shot01"
         """
         # Parse beats string into sorted list of integers
-        beat_list = []
-        if beats.strip():
-            try:
-                # Remove array brackets if present
-                beats_clean = beats.strip()
-                if beats_clean.startswith("[") and beats_clean.endswith("]"):
-                    beats_clean = beats_clean[1:-1]
-
-                # Replace newlines with commas for unified parsing
-                beats_clean = beats_clean.replace("\n", ",")
-
-                # Split by comma and parse integers
-                beat_list = sorted(
-                    [int(b.strip()) for b in beats_clean.split(",") if b.strip()]
-                )
-            except ValueError:
-                print(
-                    f"⚠️ [MF_ShotHelper] Invalid beats format '{beats}'. Using empty beats."
-                )
-                beat_list = []
+        beat_list = _parse_beats(beats)
 
-        # Determine which sequence we're in
-        sequence_num = 1
-        shot_start = 0
-
-        for beat in beat_list:
-            if step >= beat:
-                sequence_num += 1
-                shot_start = beat
-            else:
-                break
-
-        # Calculate shot number within the current sequence
-        shot_num = step - shot_start + 1
+        # Determine which sequence we're in and the shot number within it
+        sequence_num, shot_num = _sequence_shot(step, beat_list)
 
         # Generate formatted outputs
         sequence_str = str(sequence_num)
@@ -579,275 +2058,2212 @@ class MF_ShotHelper:
 
 
 # ============================================================================
-# GRAPH PLOTTER
+# STEP SHARD
 # ============================================================================
 
 
-class MF_GraphPlotter:
+class MF_StepShard:
     """
-    A ComfyUI node that plots X,Y integer data points on a graph.
-    Stores history across executions and displays interactive chart.
+    A ComfyUI node that splits a range of story steps between render
+    workers. Each worker gets its own share of the steps, in contiguous
+    blocks or strided, together with the matching MF_ShotHelper shot names
+    and per-step seeds, so machines need no shared counter.
     """
 
-    # Class variable to store graph data per node instance
-    # Key format: "node_id" -> {"x_data": [], "y_data": []}
-    _graph_data = {}
-    _state_file = None
-    _state_loaded = False
-
-    CATEGORY = "MF_PipoNodes/Analysis"
-
-    def __init__(self):
-        # Initialize state file path based on this module's location
-        if MF_GraphPlotter._state_file is None:
-            MF_GraphPlotter._state_file = os.path.join(
-                os.path.dirname(__file__), "graph_plotter_state.json"
-            )
-
-        # Only load state once when first node is created
-        if not MF_GraphPlotter._state_loaded:
-            self.load_state()
-            MF_GraphPlotter._state_loaded = True
+    CATEGORY = "MF_PipoNodes/Sequencing"
 
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "X": (
+                "start_step": (
                     "INT",
-                    {"default": 0, "min": -999999, "max": 999999, "forceInput": True},
+                    {"default": 0, "min": 0, "max": 0xFFFFFFFF, "step": 1},
                 ),
-                "Y": (
+                "step_count": (
                     "INT",
-                    {"default": 0, "min": -999999, "max": 999999, "forceInput": True},
+                    {"default": 100, "min": 1, "max": 1000000, "step": 1},
+                ),
+                "worker_index": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 4095, "step": 1},
                 ),
+                "worker_count": (
+                    "INT",
+                    {"default": 1, "min": 1, "max": 4096, "step": 1},
+                ),
+                "partition": (["contiguous", "strided"],),
             },
-            "hidden": {
-                "unique_id": "UNIQUE_ID",
+            "optional": {
+                "beats": ("STRING", {"default": "", "forceInput": True}),
+                "storySeed": ("INT", {"default": 0, "forceInput": True}),
             },
         }
 
-    RETURN_TYPES = ("INT", "INT")
-    RETURN_NAMES = ("X", "Y")
-    FUNCTION = "plot_graph"
-    OUTPUT_NODE = True
+    RETURN_TYPES = ("INT", "STRING", "STRING", "INT", "INT")
+    RETURN_NAMES = ("step_int", "step_str", "shot_name", "stepSeed", "shard_size")
+    OUTPUT_IS_LIST = (True, True, True, True, False)
+    FUNCTION = "shard_steps"
 
-    @classmethod
-    def IS_CHANGED(cls, **kwargs):
-        # Always execute to update graph
-        return float("nan")
+    @staticmethod
+    def shard_range(start_step, step_count, worker_index, worker_count, partition):
+        """
+        Return the range of steps owned by one worker. Contiguous shards
+        differ in size by at most one step; strided shards take every
+        worker_count-th step starting at start_step + worker_index.
+        """
+        if partition == "strided":
+            return range(
+                start_step + worker_index, start_step + step_count, worker_count
+            )
 
-    def load_state(self):
-        """Load graph data from JSON file"""
-        if os.path.exists(self._state_file):
-            try:
-                with open(self._state_file, "r") as f:
-                    MF_GraphPlotter._graph_data = json.load(f)
-                print(
-                    f"📊 [MF_GraphPlotter] Loaded state from {os.path.basename(self._state_file)}"
-                )
-            except Exception as e:
-                print(f"⚠️ [MF_GraphPlotter] Could not load state: {e}")
-                MF_GraphPlotter._graph_data = {}
-        else:
-            MF_GraphPlotter._graph_data = {}
+        base, extra = divmod(step_count, worker_count)
+        first = start_step + worker_index * base + min(worker_index, extra)
+        return range(first, first + base + (1 if worker_index < extra else 0))
+
+    def shard_steps(
+        self,
+        start_step,
+        step_count,
+        worker_index,
+        worker_count,
+        partition,
+        beats="",
+        storySeed=0,
+    ):
+        """
+        Emit the steps owned by this worker with their shot names and seeds.
+        """
+        if not 0 <= worker_index < worker_count:
+            raise ValueError(
+                f"worker_index {worker_index} out of range (0-{worker_count - 1})"
+            )
 
-    def save_state(self):
-        """Save graph data to JSON file"""
-        try:
-            with open(self._state_file, "w") as f:
-                json.dump(MF_GraphPlotter._graph_data, f, indent=2)
-        except Exception as e:
-            print(f"❌ [MF_GraphPlotter] Error saving state: {e}")
+        steps = list(
+            self.shard_range(
+                start_step, step_count, worker_index, worker_count, partition
+            )
+        )
+        beat_list = _parse_beats(beats, "MF_StepShard")
 
-    def get_node_data(self, node_id):
-        """Get or initialize data for this node instance"""
-        if node_id not in MF_GraphPlotter._graph_data:
-            MF_GraphPlotter._graph_data[node_id] = {"x_data": [], "y_data": []}
-        return MF_GraphPlotter._graph_data[node_id]
+        shot_names = []
+        for step in steps:
+            sequence_num, shot_num = _sequence_shot(step, beat_list)
+            shot_names.append(f"seq{sequence_num:02d}_shot{shot_num:02d}")
 
-    def plot_graph(self, X, Y, unique_id=None):
-        """
-        Add data point and update graph
-        """
-        # Get node-specific data
-        node_id = str(unique_id) if unique_id else "default"
-        node_data = self.get_node_data(node_id)
+        step_seeds = [_step_seed(storySeed, step) for step in steps]
 
-        # Add new data point
-        node_data["x_data"].append(X)
-        node_data["y_data"].append(Y)
+        print(
+            f"🎬 [MF_StepShard] Worker {worker_index + 1}/{worker_count} "
+            f"({partition}): {len(steps)} of {step_count} steps"
+        )
 
-        # Save state
-        self.save_state()
+        return (
+            steps,
+            [str(step) for step in steps],
+            shot_names,
+            step_seeds,
+            len(steps),
+        )
 
-        # Prepare data for frontend
-        graph_data = {
-            "x_values": node_data["x_data"],
-            "y_values": node_data["y_data"],
-            "node_id": node_id,
-            "point_count": len(node_data["x_data"]),
-        }
 
-        print(f"📊 [MF_GraphPlotter] Point {len(node_data['x_data'])}: ({X}, {Y})")
+# ============================================================================
+# WRITE-BEHIND PERSISTENCE
+# ============================================================================
 
-        # Return data in UI format for JavaScript to render
-        return {
-            "ui": {
-                "graph_data": [graph_data],
-            },
-            "result": (X, Y),
-        }
 
-    @classmethod
-    def reset_node_data(cls, node_id):
-        """Reset graph data for a specific node"""
-        if node_id in cls._graph_data:
-            cls._graph_data[node_id] = {"x_data": [], "y_data": []}
+class _WriteBehind:
+    """
+    Debounced write-behind for a store.
+
+    Node executions only record their changes in memory and call
+    mark_dirty(); a background thread then calls flush() once `interval`
+    seconds have passed since the first unsaved change, or as soon as
+    `max_pending` changes have accumulated. Execution latency therefore
+    does not depend on disk latency. Pending changes are also flushed when
+    the interpreter exits.
+    """
 
-            # Save state to file
+    def __init__(self, flush, name, interval=1.0, max_pending=64):
+        self._flush = flush
+        self.name = name
+        self.interval = interval
+        self.max_pending = max(int(max_pending), 1)
+        self._pending = 0
+        self._cond = threading.Condition()
+        # Serializes flushes so an older batch never lands after a newer one
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def mark_dirty(self, count=1):
+        """Record count unsaved changes, starting the flusher if needed."""
+        with self._cond:
+            self._pending += count
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending > 0)
+                deadline = time.monotonic() + self.interval
+                while self._pending < self.max_pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+    def flush(self):
+        """Write all pending changes now."""
+        with self._flush_lock:
+            with self._cond:
+                pending, self._pending = self._pending, 0
             try:
-                with open(cls._state_file, "w") as f:
-                    json.dump(cls._graph_data, f, indent=2)
-                print(f"🔄 [MF_GraphPlotter] Reset node {node_id}")
+                self._flush()
             except Exception as e:
-                print(f"❌ [MF_GraphPlotter] Error saving state: {e}")
+                # Keep the changes pending so the next flush retries them
+                with self._cond:
+                    self._pending += max(pending, 1)
+                print(f"❌ [{self.name}] Error flushing state: {e}")
 
 
 # ============================================================================
-# STORY DRIVER
+# GRAPH PLOTTER STORAGE
 # ============================================================================
 
 
-class MF_StoryDriver:
+class _GraphSegmentStore:
     """
-    A ComfyUI node that tracks story progression steps and manages seeds.
-    Increments step counter on each execution and provides seed management.
-    Perfect for sequential image generation with consistent seeds per project.
+    Append-only, per-node storage for MF_GraphPlotter history.
+
+    Each node gets its own directory holding numbered segment files of
+    one-line JSON records ({"x": X, "t": timestamp, "y": {series: value}}),
+    plus compacted chunks:
+
+        <root>/<node_id>/chunk-000004.json      (segments 1..4 merged)
+        <root>/<node_id>/chunk-000008.json      (segments 5..8 merged)
+        <root>/<node_id>/seg-000009.log         (closed segment)
+        <root>/<node_id>/seg-000010.log         (active segment)
+
+    Adding a point appends a single record to the active segment, so the
+    cost does not depend on the size of the history. Closed segments are
+    merged into a new chunk by a background thread; existing chunks are
+    never rewritten, so a compaction only costs the size of the segments
+    it merges. A snapshot-NNNNNN.json written by older versions is read
+    as the first chunk until garbage collection splits it into chunks
+    (chunk-NNNNNN-PPPP.json).
+
+    The node's retention policy is saved in retention.json, so a load
+    that does not come from an execution still reads only the retained
+    points.
+
+    With a flush_interval, appends are only queued in memory and written
+    by a _WriteBehind flusher; reads flush the queue first.
     """
 
-    # Class variable to store state across executions
-    # Key format: "projectName" -> {"step": int, "seed": int}
-    _state = {}
-    _state_file = None
-    _state_loaded = False
+    SEGMENT_MAX_RECORDS = 4096
+    COMPACT_MIN_SEGMENTS = 4
+    RETENTION_NAME = "retention.json"
+
+    def __init__(self, root_dir, legacy_file=None, flush_interval=0, flush_every=64):
+        self.root_dir = root_dir
+        self._lock = threading.RLock()
+        # node_id -> [queued record lines, record count]; only taken
+        # (after self._lock when both are needed) to queue or drain
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._write_behind = None
+        if flush_interval:
+            self._write_behind = _WriteBehind(
+                self._write_pending,
+                "MF_GraphPlotter-flush",
+                flush_interval,
+                flush_every,
+            )
+        # node_id -> [active segment index, records in active segment]
+        self._active = {}
+        # node_id -> generation, bumped on reset to invalidate compactions
+        self._generation = {}
+        self._compacting = set()
+        # node_id -> (keep_last_n, max_age) as saved in retention.json
+        self._retention = {}
 
-    CATEGORY = "MF_PipoNodes/Sequencing"
+        os.makedirs(self.root_dir, exist_ok=True)
 
-    def __init__(self):
-        # Initialize state file path based on this module's location
-        if MF_StoryDriver._state_file is None:
-            MF_StoryDriver._state_file = os.path.join(
-                os.path.dirname(__file__), "story_driver_state.json"
-            )
+        if legacy_file and os.path.exists(legacy_file):
+            self._import_legacy(legacy_file)
 
-        # Only load state once when first node is created
-        if not MF_StoryDriver._state_loaded:
-            self.load_state()
-            MF_StoryDriver._state_loaded = True
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
 
-    @classmethod
-    def INPUT_TYPES(cls):
-        return {
-            "required": {
-                "projectName": ("STRING", {"default": "MyProject", "multiline": False}),
-                "randomize_seed_on_reset": ("BOOLEAN", {"default": True}),
-            },
-            "optional": {},
-            "hidden": {
-                "unique_id": "UNIQUE_ID",
-                "extra_pnginfo": "EXTRA_PNGINFO",
-            },
-        }
+    def _node_dir(self, node_id):
+        return os.path.join(self.root_dir, quote(str(node_id), safe=""))
 
-    RETURN_TYPES = ("INT", "STRING", "STRING", "STRING", "INT")
-    RETURN_NAMES = ("step_int", "step_str", "projectName", "saveFolder", "storySeed")
-    FUNCTION = "execute"
-    OUTPUT_NODE = True
+    @staticmethod
+    def _segment_name(index):
+        return f"seg-{index:06d}.log"
 
-    @classmethod
-    def OUTPUT_COLORS(cls):
-        # Blue for integers, green for strings (ComfyUI native colors)
-        return {
-            0: "#4E9FFF",  # step_int - Blue
-            1: "#88FF88",  # step_str - Green
-            2: "#88FF88",  # projectName - Green
-            3: "#88FF88",  # saveFolder - Green
-            4: "#4E9FFF",  # storySeed - Blue
-        }
+    @staticmethod
+    def _snapshot_name(index):
+        return f"snapshot-{index:06d}.json"
 
-    @classmethod
-    def IS_CHANGED(cls, **kwargs):
-        # Always execute to increment step
-        return float("nan")
+    @staticmethod
+    def _chunk_name(index, part=None):
+        if part is None:
+            return f"chunk-{index:06d}.json"
+        return f"chunk-{index:06d}-{part:04d}.json"
 
-    def load_state(self):
-        """Load state from JSON file"""
-        if os.path.exists(self._state_file):
-            try:
-                with open(self._state_file, "r") as f:
-                    MF_StoryDriver._state = json.load(f)
-                print(
-                    f"🎬 [MF_StoryDriver] Loaded state from {os.path.basename(self._state_file)}"
-                )
-            except Exception as e:
-                print(f"⚠️ [MF_StoryDriver] Could not load state: {e}")
-                MF_StoryDriver._state = {}
-        else:
-            MF_StoryDriver._state = {}
+    def _scan(self, node_dir):
+        """
+        Return (chunks, segments): the compacted files still in use as
+        sorted (index, file name) pairs, and the sorted indices of the
+        segments not merged into any of them.
+        """
+        snapshot = None
+        chunks = []
+        segments = []
+        if not os.path.isdir(node_dir):
+            return chunks, segments
+
+        for name in os.listdir(node_dir):
+            try:
+                if name.startswith("seg-") and name.endswith(".log"):
+                    segments.append(int(name[4:-4]))
+                elif name.startswith("chunk-") and name.endswith(".json"):
+                    # Pieces of a split snapshot share its index
+                    chunks.append((int(name[6:-5].split("-")[0]), name))
+                elif name.startswith("snapshot-") and name.endswith(".json"):
+                    index = int(name[9:-5])
+                    if snapshot is None or index > snapshot:
+                        snapshot = index
+            except ValueError:
+                continue
+
+        if snapshot is not None:
+            # Older versions merged everything up to it into one snapshot
+            chunks = [c for c in chunks if c[0] > snapshot]
+            chunks.append((snapshot, self._snapshot_name(snapshot)))
+        chunks.sort()
+        if chunks:
+            # Segments left behind by an interrupted compaction are ignored
+            segments = [s for s in segments if s > chunks[-1][0]]
+        return chunks, sorted(segments)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _empty_node():
+        return {"x_data": [], "t_data": [], "series": {}}
+
+    @staticmethod
+    def _record_values(record):
+        """Series values of one record as a {series: value} dict."""
+        values = record["y"]
+        if not isinstance(values, dict):
+            # Single-series record written before multi-series support
+            values = {"Y": values}
+        return values
+
+    def _apply_record(self, node_data, record):
+        """Append one record to node_data, padding missing series with NaN."""
+        values = self._record_values(record)
+
+        count = len(node_data["x_data"])
+        series = node_data["series"]
+        for key in values:
+            if key not in series:
+                series[key] = [float("nan")] * count
+        for key, column in series.items():
+            value = values.get(key)
+            column.append(float("nan") if value is None else value)
+
+        node_data["x_data"].append(record["x"])
+        node_data["t_data"].append(record.get("t", 0.0))
+
+    def _read_segment(self, path, node_data):
+        """Apply the records of one segment file to node_data."""
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write at the end of a segment after a crash
+                    continue
+                self._apply_record(node_data, record)
+
+    @classmethod
+    def _parse_chunk(cls, f):
+        """Load one chunk (or legacy snapshot) from an open file as node_data."""
+        node_data = cls._empty_node()
+        stored = json.load(f)
+        node_data["x_data"] = stored.get("x_data", [])
+        # Snapshots migrated from the legacy state file have a single
+        # "y_data" series and no timestamps
+        if "series" in stored:
+            node_data["series"] = stored["series"]
+        elif node_data["x_data"]:
+            node_data["series"] = {"Y": stored.get("y_data", [])}
+        node_data["t_data"] = stored.get("t_data", [0.0] * len(node_data["x_data"]))
+        return node_data
+
+    def _read_chunk(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return self._parse_chunk(f)
+
+    @staticmethod
+    def _concat_nodes(parts):
+        """Join node_data parts, oldest first, padding missing series with NaN."""
+        if len(parts) == 1:
+            return parts[0]
+
+        keys = []
+        for part in parts:
+            keys.extend(key for key in part["series"] if key not in keys)
+
+        node_data = {"x_data": [], "t_data": [], "series": {key: [] for key in keys}}
+        for part in parts:
+            count = len(part["x_data"])
+            node_data["x_data"].extend(part["x_data"])
+            node_data["t_data"].extend(part["t_data"])
+            for key in keys:
+                values = part["series"].get(key)
+                node_data["series"][key].extend(
+                    values if values is not None else [float("nan")] * count
+                )
+        return node_data
+
+    @staticmethod
+    def _trim_node(node_data, keep_last_n=0, cutoff=None):
+        """Drop the points of node_data beyond keep_last_n or older than cutoff."""
+        x_data = node_data["x_data"]
+        start = max(len(x_data) - keep_last_n, 0) if keep_last_n > 0 else 0
+        if cutoff is not None:
+            start = max(start, bisect.bisect_left(node_data["t_data"], cutoff))
+        if start:
+            node_data["x_data"] = x_data[start:]
+            node_data["t_data"] = node_data["t_data"][start:]
+            node_data["series"] = {
+                key: values[start:] for key, values in node_data["series"].items()
+            }
+
+    def load(self, node_id, keep_last_n=0, max_age=0):
+        """
+        Load the history of one node from disk. With a retention policy only
+        the retained points are loaded: segments, then chunks, are read
+        newest first until keep_last_n points are found or the max_age
+        cutoff is passed. Memory then stays bounded by the retained size
+        plus one chunk.
+        """
+        self.flush()
+        cutoff = time.time() - max_age if max_age > 0 else None
+
+        with self._lock:
+            node_dir = self._node_dir(node_id)
+            chunks, segments = self._scan(node_dir)
+            try:
+                sources = [
+                    (self._read_chunk, os.path.join(node_dir, name))
+                    for _, name in chunks
+                ] + [
+                    (self._read_records, os.path.join(node_dir, self._segment_name(i)))
+                    for i in segments
+                ]
+
+                parts = []
+                count = 0
+                for read, path in reversed(sources):
+                    # A file is written after all of its points, so one last
+                    # written before the cutoff (and all before it) is expired
+                    if cutoff is not None and os.path.getmtime(path) < cutoff:
+                        break
+                    part = read(path)
+                    parts.insert(0, part)
+                    count += len(part["x_data"])
+                    if (keep_last_n > 0 and count >= keep_last_n) or (
+                        cutoff is not None
+                        and part["t_data"]
+                        and part["t_data"][0] < cutoff
+                    ):
+                        break
+
+                node_data = self._concat_nodes(parts) if parts else self._empty_node()
+                self._trim_node(node_data, keep_last_n, cutoff)
+                return node_data
+            except Exception as e:
+                print(f"⚠️ [MF_GraphPlotter] Could not load node {node_id}: {e}")
+                return self._empty_node()
+
+    def _read_records(self, path):
+        """Load the records of one segment file as node_data."""
+        node_data = self._empty_node()
+        self._read_segment(path, node_data)
+        return node_data
+
+    def iter_records(self, node_id):
+        """
+        Yield every stored point of a node as (x, timestamp, {series: value}),
+        oldest first. Chunks are parsed one at a time and segments streamed
+        line by line, so at most one chunk is held in memory while iterating.
+        """
+        self.flush()
+
+        # Open everything under the lock so a concurrent compaction cannot
+        # pull segments away mid-iteration
+        with self._lock:
+            node_dir = self._node_dir(node_id)
+            chunks, segments = self._scan(node_dir)
+            chunk_files = []
+            files = []
+            try:
+                for _, name in chunks:
+                    chunk_files.append(
+                        open(os.path.join(node_dir, name), "r", encoding="utf-8")
+                    )
+                for index in segments:
+                    files.append(
+                        open(
+                            os.path.join(node_dir, self._segment_name(index)),
+                            "r",
+                            encoding="utf-8",
+                        )
+                    )
+            except BaseException:
+                for f in chunk_files + files:
+                    f.close()
+                raise
 
-    def save_state(self):
-        """Save state to JSON file"""
         try:
-            with open(self._state_file, "w") as f:
-                json.dump(MF_StoryDriver._state, f, indent=2)
+            for f in chunk_files:
+                node_data = self._parse_chunk(f)
+                f.close()
+                series = node_data["series"]
+                for i, x in enumerate(node_data["x_data"]):
+                    yield x, node_data["t_data"][i], {
+                        key: values[i] for key, values in series.items()
+                    }
+                node_data = series = None
+
+            for f in files:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    yield record["x"], record.get("t", 0.0), self._record_values(record)
+        finally:
+            for f in chunk_files + files:
+                f.close()
+
+    # ------------------------------------------------------------------
+    # Retention settings
+    # ------------------------------------------------------------------
+
+    def retention(self, node_id):
+        """Saved (keep_last_n, max_age) of a node, (0, 0) when none is saved."""
+        with self._lock:
+            saved = self._retention.get(node_id)
+            if saved is None:
+                saved = (0, 0)
+                path = os.path.join(self._node_dir(node_id), self.RETENTION_NAME)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        stored = json.load(f)
+                    saved = (
+                        int(stored.get("keep_last_n", 0)),
+                        float(stored.get("max_age", 0)),
+                    )
+                except FileNotFoundError:
+                    pass
+                except (OSError, ValueError, TypeError, AttributeError) as e:
+                    print(
+                        f"⚠️ [MF_GraphPlotter] Ignoring retention settings of "
+                        f"node {node_id}: {e}"
+                    )
+                self._retention[node_id] = saved
+            return saved
+
+    def set_retention(self, node_id, keep_last_n=0, max_age=0):
+        """Save the retention policy of a node; only writes when it changes."""
+        with self._lock:
+            if self.retention(node_id) == (keep_last_n, max_age):
+                return
+            node_dir = self._node_dir(node_id)
+            os.makedirs(node_dir, exist_ok=True)
+            path = os.path.join(node_dir, self.RETENTION_NAME)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"keep_last_n": keep_last_n, "max_age": max_age}, f)
+            os.replace(path + ".tmp", path)
+            self._retention[node_id] = (keep_last_n, max_age)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, node_id, x_values, series_values, t):
+        """
+        Append a batch of records sharing timestamp t to the node's active
+        segment, in a single write (queued when write-behind is enabled).
+        series_values maps each series name to a list of values aligned
+        with x_values.
+        """
+        t = round(t, 3)
+        records = "".join(
+            json.dumps(
+                {
+                    "x": x,
+                    "t": t,
+                    "y": {key: values[i] for key, values in series_values.items()},
+                },
+                separators=(",", ":"),
+            )
+            + "\n"
+            for i, x in enumerate(x_values)
+        )
+
+        if self._write_behind is None:
+            with self._lock:
+                self._write_records(node_id, records, len(x_values))
+            return
+
+        with self._pending_lock:
+            pending = self._pending.setdefault(node_id, [[], 0])
+            pending[0].append(records)
+            pending[1] += len(x_values)
+        self._write_behind.mark_dirty(len(x_values))
+
+    def _write_records(self, node_id, records, count):
+        """Write encoded records to the node's active segment (lock held)."""
+        node_dir = self._node_dir(node_id)
+        active = self._active.get(node_id)
+        if active is None:
+            os.makedirs(node_dir, exist_ok=True)
+            chunks, segments = self._scan(node_dir)
+            last = max(segments + [index for index, _ in chunks] + [0])
+            active = [last + 1, 0]
+            self._active[node_id] = active
+
+        with open(
+            os.path.join(node_dir, self._segment_name(active[0])),
+            "a",
+            encoding="utf-8",
+        ) as f:
+            f.write(records)
+        active[1] += count
+
+        if active[1] >= self.SEGMENT_MAX_RECORDS:
+            # Roll over to a new segment; the closed one becomes
+            # eligible for compaction
+            active[0] += 1
+            active[1] = 0
+            self._maybe_compact(node_id, active[0])
+
+    def _write_pending(self):
+        """
+        Write every queued batch, one write per node. A node's queue is only
+        taken when it is written, and put back if the write fails, so a
+        failing node loses nothing and the next flush retries it.
+        """
+        with self._lock:
+            with self._pending_lock:
+                node_ids = list(self._pending)
+            for node_id in node_ids:
+                with self._pending_lock:
+                    pending = self._pending.pop(node_id, None)
+                if pending is None:
+                    continue
+                chunks, count = pending
+                try:
+                    self._write_records(node_id, "".join(chunks), count)
+                except BaseException:
+                    with self._pending_lock:
+                        # Ahead of records queued since
+                        queued = self._pending.pop(node_id, [[], 0])
+                        self._pending[node_id] = [
+                            chunks + queued[0],
+                            count + queued[1],
+                        ]
+                    raise
+
+    def flush(self):
+        """Write queued records to disk now (no-op without write-behind)."""
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    def reset(self, node_id):
+        """Delete all stored history for a node."""
+        with self._lock:
+            with self._pending_lock:
+                self._pending.pop(node_id, None)
+            self._generation[node_id] = self._generation.get(node_id, 0) + 1
+            self._active.pop(node_id, None)
+            self._retention.pop(node_id, None)
+
+            node_dir = self._node_dir(node_id)
+            if os.path.isdir(node_dir):
+                for name in os.listdir(node_dir):
+                    os.remove(os.path.join(node_dir, name))
+                os.rmdir(node_dir)
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def _maybe_compact(self, node_id, active_index):
+        """Start a background compaction if enough segments are closed."""
+        if node_id in self._compacting:
+            return
+
+        _, segments = self._scan(self._node_dir(node_id))
+        closed = [s for s in segments if s < active_index]
+        if len(closed) < self.COMPACT_MIN_SEGMENTS:
+            return
+
+        self._compacting.add(node_id)
+        thread = threading.Thread(
+            target=self._compact,
+            args=(node_id, closed[-1], self._generation.get(node_id, 0)),
+            name=f"MF_GraphPlotter-compact-{node_id}",
+            daemon=True,
+        )
+        thread.start()
+
+    def _compact(self, node_id, upto, generation):
+        """
+        Merge the closed segments <= upto into a new chunk. Existing chunks
+        are left untouched, so the cost is bounded by the merged segments
+        whatever the size of the history.
+        """
+        try:
+            node_dir = self._node_dir(node_id)
+
+            # Closed segments are immutable, so they can be read without
+            # holding the lock while new points keep being appended
+            with self._lock:
+                _, segments = self._scan(node_dir)
+            merged = [s for s in segments if s <= upto]
+            if not merged:
+                return
+
+            node_data = self._empty_node()
+            for index in merged:
+                self._read_segment(
+                    os.path.join(node_dir, self._segment_name(index)), node_data
+                )
+            tmp_path = os.path.join(node_dir, self._chunk_name(upto) + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(node_data, f, separators=(",", ":"))
+
+            with self._lock:
+                if self._generation.get(node_id, 0) != generation:
+                    # Node was reset while compacting; discard the result
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    return
+
+                os.replace(tmp_path, os.path.join(node_dir, self._chunk_name(upto)))
+                for index in merged:
+                    os.remove(os.path.join(node_dir, self._segment_name(index)))
+
+            print(
+                f"🗜️ [MF_GraphPlotter] Compacted node {node_id}: "
+                f"{len(merged)} segments, {len(node_data['x_data'])} points"
+            )
         except Exception as e:
-            print(f"❌ [MF_StoryDriver] Error saving state: {e}")
+            print(f"⚠️ [MF_GraphPlotter] Compaction failed for node {node_id}: {e}")
+        finally:
+            with self._lock:
+                self._compacting.discard(node_id)
+
+    def _split_snapshot(self, node_id, generation):
+        """
+        Rewrite a snapshot written by older versions as chunks of at most
+        one compaction's worth of points, so that bounded loads read only
+        the newest of them. Returns True if a snapshot was split.
+        """
+        node_dir = self._node_dir(node_id)
+        with self._lock:
+            chunks, _ = self._scan(node_dir)
+        snapshots = [
+            (index, name) for index, name in chunks if name.startswith("snapshot-")
+        ]
+        if not snapshots:
+            return False
+
+        index, name = snapshots[0]
+        node_data = self._read_chunk(os.path.join(node_dir, name))
+        size = self.COMPACT_MIN_SEGMENTS * self.SEGMENT_MAX_RECORDS
+        # Pieces are ignored by _scan while the snapshot exists, so an
+        # interrupted split leaves the history intact
+        pieces = []
+        for part, start in enumerate(range(0, len(node_data["x_data"]), size)):
+            piece = self._chunk_name(index, part)
+            with open(
+                os.path.join(node_dir, piece + ".tmp"), "w", encoding="utf-8"
+            ) as f:
+                json.dump(
+                    {
+                        "x_data": node_data["x_data"][start : start + size],
+                        "t_data": node_data["t_data"][start : start + size],
+                        "series": {
+                            key: values[start : start + size]
+                            for key, values in node_data["series"].items()
+                        },
+                    },
+                    f,
+                    separators=(",", ":"),
+                )
+            pieces.append(piece)
+
+        with self._lock:
+            if self._generation.get(node_id, 0) != generation:
+                # Node was reset while splitting; discard the result
+                for piece in pieces:
+                    if os.path.exists(os.path.join(node_dir, piece + ".tmp")):
+                        os.remove(os.path.join(node_dir, piece + ".tmp"))
+                return False
+            for piece in pieces:
+                os.replace(
+                    os.path.join(node_dir, piece + ".tmp"),
+                    os.path.join(node_dir, piece),
+                )
+            os.remove(os.path.join(node_dir, name))
+
+        print(
+            f"🗜️ [MF_GraphPlotter] Split snapshot of node {node_id} into "
+            f"{len(pieces)} chunks"
+        )
+        return True
+
+    # ------------------------------------------------------------------
+    # Garbage collection
+    # ------------------------------------------------------------------
+
+    def node_ids(self):
+        """IDs of all nodes that have data on disk."""
+        return [
+            unquote(name)
+            for name in os.listdir(self.root_dir)
+            if os.path.isdir(os.path.join(self.root_dir, name))
+        ]
+
+    @staticmethod
+    def _dir_stats(node_dir):
+        """Return (total bytes, latest modification time) of a node directory."""
+        total = 0
+        latest = 0.0
+        for name in os.listdir(node_dir):
+            stat = os.stat(os.path.join(node_dir, name))
+            total += stat.st_size
+            latest = max(latest, stat.st_mtime)
+        return total, latest
+
+    def collect_garbage(self, live_node_ids=None, ttl_seconds=0):
+        """
+        Drop the history of nodes that are not in live_node_ids (when given)
+        or have not been written for ttl_seconds (when > 0), then compact
+        the closed segments of every remaining node that has at least
+        COMPACT_MIN_SEGMENTS of them and split snapshots
+        written by older versions into chunks.
+
+        Returns {"removed": [...], "compacted": [...], "bytes_reclaimed": int}.
+        """
+        self.flush()
+        live = None if live_node_ids is None else {str(n) for n in live_node_ids}
+        cutoff = time.time() - ttl_seconds if ttl_seconds > 0 else None
+        removed = []
+        compacted = []
+        reclaimed = 0
+
+        for node_id in self.node_ids():
+            node_dir = self._node_dir(node_id)
+            try:
+                size_before, last_write = self._dir_stats(node_dir)
+            except FileNotFoundError:
+                continue
+
+            if (live is not None and node_id not in live) or (
+                cutoff is not None and last_write < cutoff
+            ):
+                self.reset(node_id)
+                removed.append(node_id)
+                reclaimed += size_before
+                continue
+
+            # Merge the closed segments into a chunk and drop leftovers of
+            # interrupted compactions and splits
+            with self._lock:
+                if node_id in self._compacting:
+                    continue
+                for name in os.listdir(node_dir):
+                    if name.endswith(".tmp"):
+                        os.remove(os.path.join(node_dir, name))
+                _, segments = self._scan(node_dir)
+                active = self._active.get(node_id)
+                closed = [s for s in segments if active is None or s < active[0]]
+                # Same threshold as during writes, so restarts do not turn
+                # every leftover segment into a chunk of its own
+                if len(closed) < self.COMPACT_MIN_SEGMENTS:
+                    closed = []
+                self._compacting.add(node_id)
+                generation = self._generation.get(node_id, 0)
+
+            try:
+                split = self._split_snapshot(node_id, generation)
+            except Exception as e:
+                split = False
+                print(
+                    f"⚠️ [MF_GraphPlotter] Could not split snapshot of node "
+                    f"{node_id}: {e}"
+                )
+            if closed:
+                self._compact(node_id, closed[-1], generation)
+            else:
+                with self._lock:
+                    self._compacting.discard(node_id)
+            if split or closed:
+                compacted.append(node_id)
+            try:
+                reclaimed += size_before - self._dir_stats(node_dir)[0]
+            except FileNotFoundError:
+                reclaimed += size_before
+
+        print(
+            f"🧹 [MF_GraphPlotter] GC removed {len(removed)} nodes, compacted "
+            f"{len(compacted)}, reclaimed {reclaimed:,} bytes"
+        )
+        return {
+            "removed": removed,
+            "compacted": compacted,
+            "bytes_reclaimed": reclaimed,
+        }
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def _import_legacy(self, legacy_file):
+        """Import a monolithic graph_plotter_state.json into the store."""
+        try:
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f)
+
+            for node_id, node_data in legacy.items():
+                node_dir = self._node_dir(node_id)
+                if os.path.isdir(node_dir):
+                    continue
+                os.makedirs(node_dir)
+                with open(
+                    os.path.join(node_dir, self._snapshot_name(0)),
+                    "w",
+                    encoding="utf-8",
+                ) as f:
+                    json.dump(
+                        {
+                            "x_data": node_data.get("x_data", []),
+                            "y_data": node_data.get("y_data", []),
+                        },
+                        f,
+                        separators=(",", ":"),
+                    )
+
+            os.replace(legacy_file, legacy_file + ".migrated")
+            print(
+                f"📊 [MF_GraphPlotter] Migrated {len(legacy)} nodes from "
+                f"{os.path.basename(legacy_file)}"
+            )
+        except Exception as e:
+            print(f"⚠️ [MF_GraphPlotter] Could not migrate legacy state: {e}")
+
+
+class _P2Quantile:
+    """
+    Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac).
+
+    Tracks five markers whose heights approximate the minimum, p/2, p,
+    (1+p)/2 quantiles and the maximum, adjusting them with a piecewise
+    parabolic fit on each new value. Constant memory and O(1) per value.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, value):
+        if self._heights is None:
+            self._initial.append(value)
+            if len(self._initial) == 5:
+                self._initial.sort()
+                self._heights = self._initial
+                self._positions = [0, 1, 2, 3, 4]
+                p = self.p
+                self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+            return
+
+        q = self._heights
+        n = self._positions
+
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the three middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] += d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def value(self):
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return 0.0
+        ordered = sorted(self._initial)
+        return ordered[int(round(self.p * (len(ordered) - 1)))]
+
+
+class _RunningStats:
+    """
+    Incrementally maintained count, min, max, mean and variance (Welford)
+    plus approximate p50/p95 for one series. NaN gaps are skipped.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self._p50 = _P2Quantile(0.5)
+        self._p95 = _P2Quantile(0.95)
+
+    def add(self, value):
+        if value != value:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self._p50.add(value)
+        self._p95.add(value)
+
+    @property
+    def variance(self):
+        """Sample variance (0 with fewer than two values)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def as_dict(self):
+        if not self.count:
+            return {
+                "count": 0,
+                "min": 0.0,
+                "max": 0.0,
+                "mean": 0.0,
+                "variance": 0.0,
+                "p50": 0.0,
+                "p95": 0.0,
+            }
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "variance": self.variance,
+            "p50": self._p50.value(),
+            "p95": self._p95.value(),
+        }
+
+
+class _GraphSeries:
+    """
+    Column-wise, array-backed history of one plotter node: a shared X
+    column, a timestamp column and one named float column per series.
+
+    Values live in typed `array` buffers (8 bytes per value instead of a
+    boxed Python number per list slot). Series that are missing for some
+    points hold NaN there. An optional retention policy bounds memory:
+    points beyond `keep_last_n`, or older than `max_age` seconds, are
+    dropped from the front. Dropping only advances a start offset; the
+    buffers are physically trimmed once more than half of them is dead, so
+    retention is amortized O(1) per point and memory stays under twice the
+    retained size.
+
+    Running statistics per series cover every point since the last reset,
+    including points dropped by retention.
+
+    `truncated` tells whether older stored points may be missing from
+    memory, and `x_sorted` whether X never decreases, so X ranges can be
+    found by bisection.
+    """
+
+    def __init__(self, keep_last_n=0, max_age=0):
+        self.x = array("q")
+        self.t = array("d")
+        self.columns = {}
+        self.stats = {}
+        self._start = 0
+        self.keep_last_n = keep_last_n
+        self.max_age = max_age
+        self.truncated = False
+        self.x_sorted = True
+
+    @classmethod
+    def from_stored(cls, stored, keep_last_n=0, max_age=0):
+        """
+        Build a series from the dict returned by _GraphSegmentStore.load.
+        Statistics cover the loaded points only.
+        """
+        series = cls(keep_last_n, max_age)
+        # A bounded load may have left older points on disk
+        series.truncated = bool(keep_last_n or max_age)
+        series._track_order(stored["x_data"])
+        series.x.extend(stored["x_data"])
+        series.t.extend(stored["t_data"])
+        for key, values in stored["series"].items():
+            series.columns[key] = array("d", values)
+            stats = series.stats[key] = _RunningStats()
+            for value in series.columns[key]:
+                stats.add(value)
+        return series
+
+    def __len__(self):
+        return len(self.x) - self._start
+
+    def set_retention(self, keep_last_n=0, max_age=0):
+        """Update the retention policy and apply it immediately."""
+        self.keep_last_n = keep_last_n
+        self.max_age = max_age
+        self._enforce_retention()
+
+    def extend(self, x_values, series_values, t):
+        """
+        Append a batch of points sharing timestamp t. series_values maps
+        series names to value lists aligned with x_values.
+        """
+        count = len(self.x)
+        batch_size = len(x_values)
+
+        for key, values in series_values.items():
+            if key not in self.columns:
+                self.columns[key] = array("d", [float("nan")]) * count
+                self.stats[key] = _RunningStats()
+            stats = self.stats[key]
+            for value in values:
+                stats.add(value)
+        for key, column in self.columns.items():
+            values = series_values.get(key)
+            if values is None:
+                column.extend(array("d", [float("nan")]) * batch_size)
+            else:
+                column.extend(values)
+
+        self._track_order(x_values)
+        self.x.extend(x_values)
+        self.t.extend([t] * batch_size)
+        self._enforce_retention()
+
+    def _track_order(self, x_values):
+        """Clear x_sorted if x_values would break the ascending X order."""
+        if not self.x_sorted:
+            return
+        previous = self.x[-1] if self.x else None
+        for x in x_values:
+            if previous is not None and x < previous:
+                self.x_sorted = False
+                return
+            previous = x
+
+    def _enforce_retention(self):
+        end = len(self.x)
+
+        if self.keep_last_n > 0 and end - self._start > self.keep_last_n:
+            self._start = end - self.keep_last_n
+
+        if self.max_age > 0:
+            cutoff = time.time() - self.max_age
+            while self._start < end and self.t[self._start] < cutoff:
+                self._start += 1
+
+        if self._start:
+            self.truncated = True
+
+        # Reclaim dead space at the front once it dominates the buffers
+        if self._start and self._start * 2 >= end:
+            del self.x[: self._start]
+            del self.t[: self._start]
+            for column in self.columns.values():
+                del column[: self._start]
+            self._start = 0
+
+    def x_values(self):
+        """Live X values as a compact array copy."""
+        return self.x[self._start :]
+
+    def column_values(self, key):
+        """Live values of one series as a compact array copy."""
+        return self.columns[key][self._start :]
+
+    def snapshot(self):
+        """
+        Private copy of the live data for readers, as
+        (x array, {series: array}, {series: stats dict}).
+        """
+        return (
+            self.x_values(),
+            {key: self.column_values(key) for key in self.columns},
+            {key: stats.as_dict() for key, stats in self.stats.items()},
+        )
+
+    def clear(self):
+        del self.x[:]
+        del self.t[:]
+        self.columns = {}
+        self.stats = {}
+        self._start = 0
+        self.truncated = False
+        self.x_sorted = True
+
+
+# ============================================================================
+# GRAPH PLOTTER
+# ============================================================================
+
+
+class MF_GraphPlotter:
+    """
+    A ComfyUI node that plots X,Y data points on a graph.
+    Up to four named series (Y as INT, Y2-Y4 as FLOAT) share the X axis.
+    Stores history across executions and displays interactive chart.
+    """
+
+    # Series input slots, in display order
+    SERIES_KEYS = ("Y", "Y2", "Y3", "Y4")
+
+    # Class variable caching graph data per node instance (loaded lazily)
+    # Key format: "node_id" -> _GraphSeries, changed only under its lock
+    _graph_data = _SharedState()
+    # Update sequence number per node, sent to the frontend with each delta
+    # Key format: "node_id" -> int
+    _graph_seq = _SharedState()
+    _store = None
+
+    # Histories not written for this many days are dropped by the garbage
+    # collection run at startup (0 = keep forever)
+    GC_TTL_DAYS = 90
+
+    # New points are written to disk by a background thread at most this
+    # many seconds later, or once FLUSH_EVERY points are queued
+    # (0 = write synchronously on every execution)
+    FLUSH_INTERVAL = 1.0
+    FLUSH_EVERY = 256
+
+    CATEGORY = "MF_PipoNodes/Analysis"
+
+    def __init__(self):
+        # Open the segment store once when first node is created
+        MF_GraphPlotter.get_store()
+
+    @classmethod
+    def get_store(cls):
+        """Get or create the segment store next to this module"""
+        if cls._store is None:
+            module_dir = os.path.dirname(__file__)
+            cls._store = _GraphSegmentStore(
+                os.path.join(module_dir, "graph_plotter_data"),
+                legacy_file=os.path.join(module_dir, "graph_plotter_state.json"),
+                flush_interval=cls.FLUSH_INTERVAL,
+                flush_every=cls.FLUSH_EVERY,
+            )
+            threading.Thread(
+                target=cls.collect_garbage,
+                name="MF_GraphPlotter-gc",
+                daemon=True,
+            ).start()
+        return cls._store
+
+    @classmethod
+    def collect_garbage(cls, live_node_ids=None, ttl_days=None):
+        """
+        Drop stored histories of nodes that are not live (when live_node_ids
+        is given) or idle for longer than ttl_days, and compact the rest.
+        Returns a report including the bytes reclaimed on disk.
+        """
+        if ttl_days is None:
+            ttl_days = cls.GC_TTL_DAYS
+
+        try:
+            report = cls.get_store().collect_garbage(
+                live_node_ids, ttl_seconds=ttl_days * 86400
+            )
+        except Exception as e:
+            print(f"⚠️ [MF_GraphPlotter] Garbage collection failed: {e}")
+            return {"removed": [], "compacted": [], "bytes_reclaimed": 0}
+
+        for node_id in report["removed"]:
+            cls._graph_data.pop(node_id, None)
+        return report
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "X": (
+                    "INT",
+                    {"default": 0, "min": -999999, "max": 999999, "forceInput": True},
+                ),
+            },
+            "optional": {
+                "Y": (
+                    "INT",
+                    {"default": 0, "min": -999999, "max": 999999, "forceInput": True},
+                ),
+                "Y2": ("FLOAT", {"default": 0.0, "forceInput": True}),
+                "Y3": ("FLOAT", {"default": 0.0, "forceInput": True}),
+                "Y4": ("FLOAT", {"default": 0.0, "forceInput": True}),
+                # Comma-separated display names for Y, Y2, Y3, Y4
+                "series_names": ("STRING", {"default": "Y, Y2, Y3, Y4"}),
+                # Series whose running statistics feed the stats outputs
+                "stats_series": (["Y", "Y2", "Y3", "Y4"], {"default": "Y"}),
+                # 0 = send every point; above this, send an LTTB-downsampled view
+                "max_display_points": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 1000000, "step": 100},
+                ),
+                # Retention of points kept in memory (0 = unlimited);
+                # the full history stays on disk
+                "keep_last_n": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 100000000, "step": 1000},
+                ),
+                "max_age_seconds": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 31536000, "step": 60},
+                ),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
+            },
+        }
+
+    # X/Y arrive as lists so a whole batch of points (e.g. from a node with
+    # list outputs) is appended in one execution, one write and one UI update
+    INPUT_IS_LIST = True
+    RETURN_TYPES = (
+        "INT",
+        "INT",
+        "INT",
+        "FLOAT",
+        "FLOAT",
+        "FLOAT",
+        "FLOAT",
+        "FLOAT",
+        "FLOAT",
+    )
+    RETURN_NAMES = ("X", "Y", "count", "min", "max", "mean", "variance", "p50", "p95")
+    OUTPUT_IS_LIST = (True, True, False, False, False, False, False, False, False)
+    FUNCTION = "plot_graph"
+    OUTPUT_NODE = True
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Always execute to update graph
+        return float("nan")
+
+    @classmethod
+    def get_node_data(cls, node_id, keep_last_n=None, max_age=None):
+        """
+        Get data for this node instance, loading it from disk on first use.
+        The retention policy given (by default the one saved by the node's
+        last execution) limits what is loaded, so a long history never has
+        to fit in memory at once.
+
+        The disk load runs without the data lock, so other nodes keep
+        plotting meanwhile; the result is published in a short locked step
+        unless another thread got there first or the node was reset while
+        loading (then it is loaded again).
+        """
+        series = cls._graph_data.get(node_id)
+        while series is None:
+            seq = cls._graph_seq.get(node_id, 0)
+            if keep_last_n is None or max_age is None:
+                saved = cls.get_store().retention(node_id)
+                keep_last_n = saved[0] if keep_last_n is None else keep_last_n
+                max_age = saved[1] if max_age is None else max_age
+            stored = cls.get_store().load(node_id, keep_last_n, max_age)
+            loaded = _GraphSeries.from_stored(stored, keep_last_n, max_age)
+
+            with cls._graph_data.lock:
+                series = cls._graph_data.get(node_id)
+                if series is None and cls._graph_seq.get(node_id, 0) == seq:
+                    series = loaded
+                    cls._graph_data.set(node_id, series)
+        return series
+
+    @classmethod
+    def _next_seq(cls, node_id):
+        """Advance and return the update sequence number for a node"""
+        return cls._graph_seq.update(node_id, lambda seq: seq + 1, 0)
+
+    @classmethod
+    def _series_labels(cls, series_names):
+        """Map series slots to the display names given in series_names"""
+        names = [n.strip() for n in (series_names or "").split(",")]
+        return {
+            key: names[i] if i < len(names) and names[i] else key
+            for i, key in enumerate(cls.SERIES_KEYS)
+        }
+
+    @classmethod
+    def get_full_data(
+        cls,
+        node_id,
+        max_display_points=0,
+        series_names=None,
+        keep_last_n=None,
+        max_age=None,
+    ):
+        """
+        Full history of a node, used by the frontend to resync its chart
+        when it is freshly loaded or detects a gap in the delta sequence.
+        Downsampled with LTTB when it exceeds max_display_points. The
+        retention policy bounds a cold load from disk, as in get_node_data.
+        """
+        series = cls.get_node_data(node_id, keep_last_n, max_age)
+        with cls._graph_data.lock:
+            x_values, columns, stats = series.snapshot()
+            seq = cls._graph_seq.get(node_id, 0)
+        point_count = len(x_values)
+        downsampled = 0 < max_display_points < point_count
+
+        if downsampled:
+            # Downsample each series within its share of the budget and keep
+            # the union of picked points so all series stay aligned on X
+            budget = max(max_display_points // max(len(columns), 1), 3)
+            picked = [_lttb_indices(x_values, col, budget) for col in columns.values()]
+            indices = np.unique(np.concatenate(picked)).tolist() if picked else []
+            x_values = [x_values[i] for i in indices]
+            columns = {
+                key: _json_floats(col[i] for i in indices)
+                for key, col in columns.items()
+            }
+        else:
+            x_values = x_values.tolist()
+            columns = {key: _json_floats(col) for key, col in columns.items()}
+
+        return {
+            "x_values": x_values,
+            "series": columns,
+            "labels": cls._series_labels(series_names),
+            "stats": stats,
+            "node_id": node_id,
+            "seq": seq,
+            "offset": 0,
+            "point_count": point_count,
+            "downsampled": downsampled,
+        }
+
+    def plot_graph(
+        self,
+        X,
+        Y=None,
+        Y2=None,
+        Y3=None,
+        Y4=None,
+        series_names=None,
+        stats_series=None,
+        max_display_points=0,
+        keep_last_n=0,
+        max_age_seconds=0,
+        unique_id=None,
+    ):
+        """
+        Add a batch of data points and update graph.
+        With INPUT_IS_LIST every argument is a list; X and the connected
+        Y inputs hold the batch, the other inputs hold a single value.
+        """
+        series_names = _first_value(series_names, None)
+        stats_series = _first_value(stats_series, "Y")
+        max_display_points = _first_value(max_display_points, 0)
+        keep_last_n = _first_value(keep_last_n, 0)
+        max_age_seconds = _first_value(max_age_seconds, 0)
+        unique_id = _first_value(unique_id, None)
+
+        # Only connected series take part in this batch
+        series_values = {
+            key: values
+            for key, values in zip(self.SERIES_KEYS, (Y, Y2, Y3, Y4))
+            if values is not None
+        }
+        if not series_values:
+            print("⚠️ [MF_GraphPlotter] No Y input connected. Nothing to plot.")
+            return {"ui": {}, "result": (X, []) + self._stats_result(None)}
+
+        lengths = [len(X)] + [len(values) for values in series_values.values()]
+        batch_size = min(lengths)
+        if max(lengths) != batch_size:
+            print(
+                f"⚠️ [MF_GraphPlotter] Inputs have different lengths {lengths}. "
+                "Extra values are ignored."
+            )
+        X = list(X[:batch_size])
+        # Y passes through the plotted batch; when only Y2-Y4 are connected
+        # the first of them stands in, so downstream nodes still get values
+        Y = list(next(iter(series_values.values()))[:batch_size])
+        series_values = {
+            key: [float(v) for v in values[:batch_size]]
+            for key, values in series_values.items()
+        }
+
+        # Get node-specific data
+        node_id = str(unique_id) if unique_id else "default"
+        series = self.get_node_data(node_id, keep_last_n, max_age_seconds)
+
+        with self._graph_data.lock:
+            series.set_retention(keep_last_n, max_age_seconds)
+
+            # Add new data points in one operation
+            now = time.time()
+            series.extend(X, series_values, now)
+
+            # Persist only the new points
+            try:
+                self.get_store().set_retention(node_id, keep_last_n, max_age_seconds)
+                self.get_store().append(node_id, X, series_values, now)
+            except Exception as e:
+                print(f"❌ [MF_GraphPlotter] Error saving state: {e}")
+
+            # Prepare delta for frontend: only the new points, plus the
+            # sequence number the widget uses to detect missed updates
+            point_count = len(series)
+            seq = self._next_seq(node_id)
+            series_keys = list(series.columns)
+            stats = {key: s.as_dict() for key, s in series.stats.items()}
+
+        if 0 < max_display_points < point_count:
+            # Too many points to draw: send a bounded downsampled view instead
+            graph_data = self.get_full_data(node_id, max_display_points, series_names)
+        else:
+            # Points already dropped by retention are not worth sending
+            sent = min(batch_size, point_count)
+            skip = batch_size - sent
+            graph_data = {
+                "x_values": X[skip:],
+                "series": {
+                    key: (
+                        _json_floats(series_values[key][skip:])
+                        if key in series_values
+                        else [None] * sent
+                    )
+                    for key in series_keys
+                },
+                "labels": self._series_labels(series_names),
+                "stats": stats,
+                "node_id": node_id,
+                "seq": seq,
+                "offset": point_count - sent,
+                "point_count": point_count,
+                "downsampled": False,
+            }
+
+        if batch_size == 1:
+            values = ", ".join(f"{v[0]:g}" for v in series_values.values())
+            print(f"📊 [MF_GraphPlotter] Point {point_count}: ({X[0]}, {values})")
+        else:
+            print(
+                f"📊 [MF_GraphPlotter] Added {batch_size} points ({point_count} total)"
+            )
+
+        # Return data in UI format for JavaScript to render
+        return {
+            "ui": {
+                "graph_data": [graph_data],
+            },
+            "result": (X, Y) + self._stats_result(stats.get(stats_series)),
+        }
+
+    @staticmethod
+    def _stats_result(stats):
+        """Stats output values (count, min, max, mean, variance, p50, p95)"""
+        values = stats or _RunningStats().as_dict()
+        return (
+            values["count"],
+            values["min"],
+            values["max"],
+            values["mean"],
+            values["variance"],
+            values["p50"],
+            values["p95"],
+        )
+
+    @classmethod
+    def get_series_range(cls, node_id, start=0, limit=1000, x_min=None, x_max=None):
+        """
+        One page of a node's history, by index and optionally restricted to
+        x_min <= X <= x_max. Indices count from the oldest stored point
+        (after filtering, when an X range is given), as in /export.
+
+        Served from memory when it holds the whole history; only the page
+        is copied, and X ranges are found by bisection while X is sorted.
+        Once retention has dropped points from memory the page is read
+        from disk instead.
+        """
+        series = cls.get_node_data(node_id)
+        with cls._graph_data.lock:
+            if not series.truncated:
+                return cls._memory_range(series, node_id, start, limit, x_min, x_max)
+        return cls._stored_range(node_id, start, limit, x_min, x_max)
+
+    @staticmethod
+    def _memory_range(series, node_id, start, limit, x_min, x_max):
+        """Page of an in-memory series; call with the data lock held."""
+        lo, hi = series._start, len(series.x)
+
+        if x_min is None and x_max is None:
+            indices = None
+        elif series.x_sorted:
+            if x_min is not None:
+                lo = bisect.bisect_left(series.x, x_min, lo, hi)
+            if x_max is not None:
+                hi = bisect.bisect_right(series.x, x_max, lo, hi)
+            indices = None
+        else:
+            x_values = np.asarray(series.x_values())
+            mask = np.ones(len(x_values), dtype=bool)
+            if x_min is not None:
+                mask &= x_values >= x_min
+            if x_max is not None:
+                mask &= x_values <= x_max
+            indices = np.flatnonzero(mask) + series._start
+
+        if indices is None:
+            total = hi - lo
+            first = min(lo + start, hi)
+            last = min(first + limit, hi)
+            x_page = series.x[first:last].tolist()
+            columns = {
+                key: _json_floats(column[first:last])
+                for key, column in series.columns.items()
+            }
+        else:
+            total = len(indices)
+            page = indices[start : start + limit]
+            x_page = [series.x[i] for i in page]
+            columns = {
+                key: _json_floats([column[i] for i in page])
+                for key, column in series.columns.items()
+            }
+
+        end = start + len(x_page)
+        return {
+            "node_id": node_id,
+            "x_values": x_page,
+            "series": columns,
+            "start": start,
+            "total": total,
+            "next_start": end if end < total else None,
+        }
+
+    @classmethod
+    def _stored_range(cls, node_id, start, limit, x_min, x_max):
+        """Page of a node's on-disk history, streamed record by record."""
+        rows = []
+        total = 0
+        for x, t, values in cls.get_store().iter_records(node_id):
+            if (x_min is not None and x < x_min) or (x_max is not None and x > x_max):
+                continue
+            if start <= total < start + limit:
+                rows.append((x, values))
+            total += 1
+
+        keys = [key for key in cls.SERIES_KEYS if any(key in v for _, v in rows)]
+        end = start + len(rows)
+        return {
+            "node_id": node_id,
+            "x_values": [x for x, _ in rows],
+            "series": {
+                key: _json_floats([values.get(key) for _, values in rows])
+                for key in keys
+            },
+            "start": start,
+            "total": total,
+            "next_start": end if end < total else None,
+        }
+
+    @classmethod
+    def export_chunks(cls, node_id, export_format="csv", chunk_rows=2000):
+        """
+        Yield the full on-disk history of a node as encoded CSV or NDJSON
+        chunks of up to chunk_rows rows, for streaming HTTP responses.
+        """
+        keys = cls.SERIES_KEYS
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(("x", "timestamp") + keys)
+            yield buffer.getvalue().encode("utf-8")
+
+        rows = []
+        for x, t, values in cls.get_store().iter_records(node_id):
+            if export_format == "csv":
+                rows.append(
+                    [x, t]
+                    + [
+                        (
+                            ""
+                            if values.get(key) is None or values[key] != values[key]
+                            else values[key]
+                        )
+                        for key in keys
+                    ]
+                )
+            else:
+                rows.append(
+                    json.dumps(
+                        {
+                            "x": x,
+                            "t": t,
+                            "y": {
+                                key: value
+                                for key, value in values.items()
+                                if value is not None and value == value
+                            },
+                        },
+                        separators=(",", ":"),
+                    )
+                )
+
+            if len(rows) >= chunk_rows:
+                yield cls._encode_export_rows(rows, export_format)
+                rows = []
+
+        if rows:
+            yield cls._encode_export_rows(rows, export_format)
+
+    @staticmethod
+    def _encode_export_rows(rows, export_format):
+        if export_format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            return buffer.getvalue().encode("utf-8")
+        return ("\n".join(rows) + "\n").encode("utf-8")
+
+    @classmethod
+    def reset_node_data(cls, node_id):
+        """Reset graph data for a specific node, returning the new sequence number"""
+        with cls._graph_data.lock:
+            series = cls._graph_data.get(node_id)
+            if series is not None:
+                series.clear()
+
+            # Drop the node's segments from disk
+            try:
+                cls.get_store().reset(node_id)
+                print(f"🔄 [MF_GraphPlotter] Reset node {node_id}")
+            except Exception as e:
+                print(f"❌ [MF_GraphPlotter] Error saving state: {e}")
+
+            # Bumped once the files are gone: a load that started before
+            # sees the change and is discarded by get_node_data
+            seq = cls._next_seq(node_id)
+
+        return seq
+
+
+# ============================================================================
+# STORY DRIVER STORAGE
+# ============================================================================
+
+
+class _FileLock:
+    """
+    Exclusive inter-process lock held on a sidecar file.
+
+    Uses POSIX record locks (fcntl.lockf), which unlike flock are also
+    honoured by NFS, or msvcrt.locking on Windows. Blocks until acquired.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX)
+            else:
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ~10 seconds; keep waiting
+                        continue
+        except BaseException:
+            self._file.close()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class _StoryStateStore:
+    """
+    SQLite-backed storage for MF_StoryDriver project state.
+
+    Each project is one row of a WAL-mode database, so advancing a step is a
+    single-row UPDATE in a short transaction instead of a rewrite of every
+    project's state, and a crash can at most lose the step being written.
+    Seeds span the full unsigned 64-bit range, which does not fit SQLite's
+    signed INTEGER, so they are stored as TEXT.
+
+    With cache enabled, reads are served from an in-memory copy that is
+    updated by every write made through this store. With a flush_interval
+    as well, the cache becomes authoritative: steps advance in memory and
+    changed rows are written in one transaction by a _WriteBehind flusher,
+    at the cost of losing the last interval of steps on a hard crash.
+
+    In shared mode the database may be used by several ComfyUI processes,
+    possibly on different hosts through a network share: the cache and
+    write-behind are disabled, the rollback journal replaces WAL (whose
+    shared-memory index only works on a single host), and every write
+    transaction additionally holds an exclusive lock on "<db_path>.lock".
+    Reading and incrementing a step then happen atomically across all
+    workers, so no step is handed out twice.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        legacy_file=None,
+        cache=True,
+        shared=False,
+        flush_interval=0,
+        flush_every=64,
+    ):
+        self.db_path = db_path
+        self.shared = shared
+        # Guards the cache and dirty set; taken before _db_lock
+        self._lock = threading.RLock()
+        # Guards the connection
+        self._db_lock = threading.RLock()
+        # project name -> {"step": int, "seed": int}, or None when disabled.
+        # Cached states are replaced, never changed in place
+        self._cache = _SharedState() if cache and not shared else None
+        # Cached projects changed since the last write-behind flush
+        self._dirty = set()
+        self._file_lock = _FileLock(db_path + ".lock") if shared else None
+        self._write_behind = None
+        if flush_interval and self._cache is not None:
+            self._write_behind = _WriteBehind(
+                self._write_dirty, "MF_StoryDriver-flush", flush_interval, flush_every
+            )
+
+        # Autocommit mode: transactions are opened explicitly below
+        self._conn = sqlite3.connect(
+            db_path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        if shared:
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute("PRAGMA synchronous=FULL")
+        else:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS projects ("
+            "name TEXT PRIMARY KEY, step INTEGER NOT NULL, seed TEXT NOT NULL)"
+        )
+
+        if legacy_file and os.path.exists(legacy_file):
+            self._import_legacy(legacy_file)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Run the block in a write transaction (BEGIN IMMEDIATE), holding the
+        inter-process file lock in shared mode.
+        """
+        with self._db_lock, self._file_lock or contextlib.nullcontext():
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _select(self, conn, name):
+        row = conn.execute(
+            "SELECT step, seed FROM projects WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"step": row[0], "seed": int(row[1])}
+
+    def _remember(self, name, state, dirty=False):
+        with self._lock:
+            if self._cache is not None:
+                self._cache.set(name, state)
+                if dirty:
+                    self._dirty.add(name)
+        if dirty:
+            self._write_behind.mark_dirty()
+        return dict(state)
+
+    def get(self, name):
+        """Return a copy of a project's state, or None if it does not exist."""
+        if self._cache is not None:
+            state = self._cache.get(name)
+            if state is not None:
+                return dict(state)
+
+        with self._lock:
+            if self._cache is not None and name in self._cache:
+                return dict(self._cache.get(name))
+
+            with self._db_lock:
+                state = self._select(self._conn, name)
+            if state is None:
+                return None
+            return self._remember(name, state)
+
+    def get_or_create(self, name, seed):
+        """Return a project's state, creating it at step 0 with seed."""
+        if self._write_behind is not None:
+            with self._lock:
+                state = self.get(name)
+                if state is not None:
+                    return state
+                return self._remember(name, {"step": 0, "seed": seed}, dirty=True)
+
+        state = self.get(name)
+        if state is not None:
+            return state
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO projects (name, step, seed) VALUES (?, 0, ?)",
+                (name, str(seed)),
+            )
+            state = self._select(conn, name)
+        return self._remember(name, state)
+
+    def advance(self, name, seed, count=1):
+        """
+        Hand out a project's next count consecutive steps in one transaction,
+        creating the project with seed if needed. Returns the state before
+        the increment, i.e. with the first reserved step.
+        """
+        if self._write_behind is not None:
+            with self._lock:
+                state = self.get(name) or {"step": 0, "seed": seed}
+                self._remember(
+                    name,
+                    {"step": state["step"] + count, "seed": state["seed"]},
+                    dirty=True,
+                )
+            return state
+
+        with self._transaction() as conn:
+            state = self._select(conn, name)
+            if state is None:
+                state = {"step": 0, "seed": seed}
+                conn.execute(
+                    "INSERT INTO projects (name, step, seed) VALUES (?, ?, ?)",
+                    (name, count, str(seed)),
+                )
+            else:
+                conn.execute(
+                    "UPDATE projects SET step = step + ? WHERE name = ?",
+                    (count, name),
+                )
+
+        self._remember(name, {"step": state["step"] + count, "seed": state["seed"]})
+        return state
+
+    def reset(self, name, seed, keep_seed=False):
+        """
+        Set a project's step back to 0 and its seed to seed (unless
+        keep_seed is set and the project exists). Returns the new state.
+        """
+        if self._write_behind is not None:
+            with self._lock:
+                state = self.get(name)
+                if state is not None and keep_seed:
+                    seed = state["seed"]
+                return self._remember(name, {"step": 0, "seed": seed}, dirty=True)
+
+        with self._transaction() as conn:
+            state = self._select(conn, name)
+            if state is not None and keep_seed:
+                seed = state["seed"]
+            conn.execute(
+                "INSERT OR REPLACE INTO projects (name, step, seed) VALUES (?, 0, ?)",
+                (name, str(seed)),
+            )
+        return self._remember(name, {"step": 0, "seed": seed})
+
+    def _write_dirty(self):
+        """Write every project changed since the last flush in one transaction."""
+        with self._lock:
+            names, self._dirty = self._dirty, set()
+            cache = self._cache.snapshot()
+        if not names:
+            return
+
+        rows = [(name, cache[name]["step"], str(cache[name]["seed"])) for name in names]
+
+        try:
+            with self._transaction() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO projects (name, step, seed) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+        except BaseException:
+            with self._lock:
+                self._dirty.update(names)
+            raise
+
+    def flush(self):
+        """Write pending changes now (no-op without write-behind)."""
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    def _import_legacy(self, legacy_file):
+        """Import story_driver_state.json, keeping rows already in the store."""
+        try:
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f)
+
+            with self._transaction() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO projects (name, step, seed) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (name, int(state["step"]), str(int(state["seed"])))
+                        for name, state in legacy.items()
+                    ],
+                )
+
+            os.replace(legacy_file, legacy_file + ".migrated")
+            print(
+                f"🎬 [MF_StoryDriver] Migrated {len(legacy)} projects from "
+                f"{os.path.basename(legacy_file)}"
+            )
+        except Exception as e:
+            print(f"⚠️ [MF_StoryDriver] Could not migrate legacy state: {e}")
+
+
+# ============================================================================
+# STORY DRIVER
+# ============================================================================
+
+
+class MF_StoryDriver:
+    """
+    A ComfyUI node that tracks story progression steps and manages seeds.
+    Increments step counter on each execution and provides seed management.
+    Perfect for sequential image generation with consistent seeds per project.
+    """
+
+    # SQLite store holding {"step": int, "seed": int} per project name
+    _store = None
+    # Serve reads from an in-memory copy of the store (ignored when shared)
+    STATE_CACHE = True
+    # Directory holding the state database shared by several ComfyUI
+    # workers; setting it enables lock-protected step allocation
+    SHARED_STATE_DIR = os.environ.get("MF_STORY_DRIVER_STATE_DIR") or None
+    # Steps are written to disk by a background thread at most this many
+    # seconds later, or once FLUSH_EVERY changes are pending (0 = write
+    # every step synchronously; always the case in shared mode)
+    FLUSH_INTERVAL = 1.0
+    FLUSH_EVERY = 64
+
+    CATEGORY = "MF_PipoNodes/Sequencing"
+
+    def __init__(self):
+        # Open the store (and import any legacy JSON state) on first use
+        MF_StoryDriver.get_store()
+
+    @classmethod
+    def get_store(cls):
+        """
+        Get or create the state database, next to this module or in
+        SHARED_STATE_DIR when several workers share it
+        """
+        if cls._store is None:
+            module_dir = os.path.dirname(__file__)
+            state_dir = cls.SHARED_STATE_DIR or module_dir
+            os.makedirs(state_dir, exist_ok=True)
+            cls._store = _StoryStateStore(
+                os.path.join(state_dir, "story_driver_state.db"),
+                legacy_file=os.path.join(module_dir, "story_driver_state.json"),
+                cache=cls.STATE_CACHE,
+                shared=cls.SHARED_STATE_DIR is not None,
+                flush_interval=cls.FLUSH_INTERVAL,
+                flush_every=cls.FLUSH_EVERY,
+            )
+        return cls._store
+
+    @staticmethod
+    def _new_seed():
+        return random.randint(0, 0xFFFFFFFFFFFFFFFF)
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "projectName": ("STRING", {"default": "MyProject", "multiline": False}),
+                "randomize_seed_on_reset": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                "reserve_count": (
+                    "INT",
+                    {"default": 1, "min": 1, "max": 4096, "step": 1},
+                ),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
+                "extra_pnginfo": "EXTRA_PNGINFO",
+            },
+        }
+
+    RETURN_TYPES = ("INT", "STRING", "STRING", "STRING", "INT", "INT")
+    RETURN_NAMES = (
+        "step_int",
+        "step_str",
+        "projectName",
+        "saveFolder",
+        "storySeed",
+        "stepSeed",
+    )
+    # step_int, step_str, saveFolder and stepSeed hold one entry per
+    # reserved step
+    OUTPUT_IS_LIST = (True, True, False, True, False, True)
+    FUNCTION = "execute"
+    OUTPUT_NODE = True
+
+    @classmethod
+    def OUTPUT_COLORS(cls):
+        # Blue for integers, green for strings (ComfyUI native colors)
+        return {
+            0: "#4E9FFF",  # step_int - Blue
+            1: "#88FF88",  # step_str - Green
+            2: "#88FF88",  # projectName - Green
+            3: "#88FF88",  # saveFolder - Green
+            4: "#4E9FFF",  # storySeed - Blue
+            5: "#4E9FFF",  # stepSeed - Blue
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Always execute to increment step
+        return float("nan")
 
     def get_project_state(self, project_name):
         """Get or initialize state for a project"""
-        if project_name not in MF_StoryDriver._state:
-            MF_StoryDriver._state[project_name] = {
-                "step": 0,
-                "seed": random.randint(0, 0xFFFFFFFFFFFFFFFF),
-            }
-            self.save_state()
-        return MF_StoryDriver._state[project_name]
+        return self.get_store().get_or_create(project_name, self._new_seed())
 
     def execute(
-        self, projectName, randomize_seed_on_reset, unique_id=None, extra_pnginfo=None
+        self,
+        projectName,
+        randomize_seed_on_reset,
+        reserve_count=1,
+        unique_id=None,
+        extra_pnginfo=None,
     ):
         """
-        Execute the node - increment step and return all outputs
+        Execute the node - reserve reserve_count consecutive steps in one
+        transaction and return all outputs, one list entry per step
         """
-        # Get current project state
-        project_state = self.get_project_state(projectName)
+        reserve_count = max(int(reserve_count), 1)
+
+        # Take the current step(s) and increment for the next execution
+        project_state = self.get_store().advance(
+            projectName, self._new_seed(), reserve_count
+        )
 
         # Get current values
         current_step = project_state["step"]
         current_seed = project_state["seed"]
-
-        # Increment step for next execution
-        project_state["step"] = current_step + 1
-        self.save_state()
+        last_step = current_step + reserve_count - 1
 
         # Prepare outputs
-        step_int = current_step
-        step_str = str(current_step)
+        steps = list(range(current_step, last_step + 1))
+        step_int = steps
+        step_str = [str(step) for step in steps]
         story_seed = current_seed
+        step_seed = [_step_seed(current_seed, step) for step in steps]
 
         # Replace spaces with underscores in projectName output
         project_name_output = projectName.replace(" ", "_")
 
         # Create saveFolder output (projectName_seed format)
-        save_folder = f"{project_name_output}_{current_seed}"
+        save_folder = [f"{project_name_output}_{current_seed}"] * reserve_count
 
         # Format status display
-        status_text = f"Step: {current_step} | Seed: {current_seed}"
+        if reserve_count == 1:
+            step_text = f"Step {current_step}"
+        else:
+            step_text = f"Steps {current_step}-{last_step}"
+        status_text = f"{step_text.replace(' ', ': ', 1)} | Seed: {current_seed}"
 
-        print(
-            f"🎬 [MF_StoryDriver] {projectName}: Step {current_step}, Seed {current_seed}"
-        )
+        print(f"🎬 [MF_StoryDriver] {projectName}: {step_text}, Seed {current_seed}")
 
         # Return in the format that works with the JavaScript extension
         return {
@@ -860,6 +4276,7 @@ class MF_StoryDriver:
                 project_name_output,
                 save_folder,
                 story_seed,
+                step_seed,
             ),
         }
 
@@ -868,24 +4285,17 @@ class MF_StoryDriver:
         """
         Reset a project's step counter and optionally randomize seed
         This method is called by the reset button via API
+        Returns the project's new state
         """
-        if project_name in cls._state:
-            cls._state[project_name]["step"] = 0
-            if randomize_seed:
-                cls._state[project_name]["seed"] = random.randint(0, 0xFFFFFFFFFFFFFFFF)
-        else:
-            cls._state[project_name] = {
-                "step": 0,
-                "seed": random.randint(0, 0xFFFFFFFFFFFFFFFF),
-            }
-
-        # Save state to file
         try:
-            with open(cls._state_file, "w") as f:
-                json.dump(cls._state, f, indent=2)
+            state = cls.get_store().reset(
+                project_name, cls._new_seed(), keep_seed=not randomize_seed
+            )
             print(f"🔄 [MF_StoryDriver] Reset project: {project_name}")
         except Exception as e:
             print(f"❌ [MF_StoryDriver] Error saving state: {e}")
+            raise
+        return state
 
 
 # ============================================================================
@@ -1230,9 +4640,12 @@ NODE_CLASS_MAPPINGS = {
     "MF_LineSelect": MF_LineSelect,
     "MF_LogFile": MF_LogFile,
     "MF_LogReader": MF_LogReader,
+    "MF_LogSearch": MF_LogSearch,
+    "MF_LogQuery": MF_LogQuery,
     "MF_Modulo": MF_Modulo,
     "MF_ModuloAdvanced": MF_ModuloAdvanced,
     "MF_ShotHelper": MF_ShotHelper,
+    "MF_StepShard": MF_StepShard,
     "MF_GraphPlotter": MF_GraphPlotter,
     "MF_StoryDriver": MF_StoryDriver,
     "MF_SaveData": MFSaveData,  # NEW in v1.4.0!
@@ -1247,9 +4660,12 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "MF_LineSelect": "MF Line Select",
     "MF_LogFile": "MF Log File",
     "MF_LogReader": "MF Log Reader",
+    "MF_LogSearch": "MF Log Search",
+    "MF_LogQuery": "MF Log Query",
     "MF_Modulo": "MF Modulo",
     "MF_ModuloAdvanced": "MF Modulo Advanced",
     "MF_ShotHelper": "MF Shot Helper",
+    "MF_StepShard": "MF Step Shard",
     "MF_GraphPlotter": "MF Graph Plotter",
     "MF_StoryDriver": "MF Story Driver",
     "MF_SaveData": "MF Save Data",  # NEW in v1.4.0!
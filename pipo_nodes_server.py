@@ -5,11 +5,28 @@ API routes for Graph Plotter and Story Driver functionality
 
 from aiohttp import web
 import server
+import asyncio
 import base64
+import ctypes
+import ctypes.util
+import folder_paths
 import os
+import select
+import shutil
+import sys
+import tempfile
+import threading
+import time
 
 # Import the node classes to access their state
-from .pipo_nodes_integrated import MF_GraphPlotter, MF_StoryDriver
+from .pipo_nodes_integrated import (
+    MF_GraphPlotter,
+    MF_LogReader,
+    MF_StoryDriver,
+    _get_log_file_path,
+    _log_end_position,
+    _read_new_lines,
+)
 
 
 @server.PromptServer.instance.routes.post("/graph_plotter/reset")
@@ -26,46 +43,342 @@ async def reset_graph_plotter(request):
                 {"success": False, "error": "node_id is required"}, status=400
             )
 
-        # Call the reset method on the node class
-        MF_GraphPlotter.reset_node_data(node_id)
+        # Resetting waits for the node's data lock and deletes files, so it
+        # runs off the event loop
+        loop = asyncio.get_running_loop()
+        seq = await loop.run_in_executor(None, MF_GraphPlotter.reset_node_data, node_id)
 
         return web.json_response(
-            {"success": True, "node_id": node_id, "message": "Graph data reset"}
+            {
+                "success": True,
+                "node_id": node_id,
+                "seq": seq,
+                "message": "Graph data reset",
+            }
         )
 
     except Exception as e:
         return web.json_response({"success": False, "error": str(e)}, status=500)
 
 
-@server.PromptServer.instance.routes.post("/graph_plotter/save_image")
-async def save_graph_image(request):
+@server.PromptServer.instance.routes.post("/graph_plotter/gc")
+async def collect_graph_garbage(request):
     """
-    API endpoint to save graph image from base64 data to user-selected path
+    API endpoint to garbage-collect stored Graph Plotter histories.
+    Optional body: {"live_node_ids": [...], "ttl_days": N}. When
+    live_node_ids is given, every other node's history is dropped.
     """
     try:
-        data = await request.json()
-        image_data = data.get("image_data")
-        save_path = data.get("save_path")
+        data = await request.json() if request.can_read_body else {}
+        live_node_ids = data.get("live_node_ids")
+        ttl_days = data.get("ttl_days")
 
-        if not image_data or not save_path:
+        if live_node_ids is not None and not isinstance(live_node_ids, list):
             return web.json_response(
-                {"success": False, "error": "image_data and save_path are required"},
+                {"success": False, "error": "live_node_ids must be a list"},
                 status=400,
             )
 
-        # Remove data URL prefix if present
-        if image_data.startswith("data:image"):
-            image_data = image_data.split(",")[1]
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(
+            None,
+            MF_GraphPlotter.collect_garbage,
+            live_node_ids,
+            float(ttl_days) if ttl_days is not None else None,
+        )
+
+        return web.json_response({"success": True, **report})
+
+    except Exception as e:
+        return web.json_response({"success": False, "error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.get("/graph_plotter/data")
+async def get_graph_data(request):
+    """
+    API endpoint returning a Graph Plotter node's full history, used by the
+    widget to resync when freshly loaded or after missing a delta update.
+    Optional max_points query parameter returns an LTTB-downsampled view.
+    """
+    try:
+        node_id = request.query.get("node_id")
+
+        if not node_id:
+            return web.json_response(
+                {"success": False, "error": "node_id is required"}, status=400
+            )
+
+        max_display_points = int(request.query.get("max_points", 0))
+        series_names = request.query.get("series_names")
+        # Retention settings of the widget bound a cold load from disk;
+        # without them the node's saved settings apply
+        keep_last_n = request.query.get("keep_last_n")
+        max_age = request.query.get("max_age_seconds")
+        keep_last_n = int(keep_last_n) if keep_last_n not in (None, "") else None
+        max_age = float(max_age) if max_age not in (None, "") else None
+
+        # Loading a history from disk and downsampling it are blocking work
+        loop = asyncio.get_running_loop()
+        graph_data = await loop.run_in_executor(
+            None,
+            MF_GraphPlotter.get_full_data,
+            node_id,
+            max_display_points,
+            series_names,
+            keep_last_n,
+            max_age,
+        )
+
+        return web.json_response({"success": True, **graph_data})
+
+    except Exception as e:
+        return web.json_response({"success": False, "error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.get("/graph_plotter/series")
+async def get_graph_series(request):
+    """
+    API endpoint returning one page of a Graph Plotter node's series,
+    by index (start, limit) and optionally within an X range (x_min, x_max)
+    """
+    try:
+        node_id = request.query.get("node_id")
+
+        if not node_id:
+            return web.json_response(
+                {"success": False, "error": "node_id is required"}, status=400
+            )
+
+        try:
+            start = max(int(request.query.get("start", 0)), 0)
+            limit = min(max(int(request.query.get("limit", 1000)), 1), 10000)
+            x_min = request.query.get("x_min")
+            x_max = request.query.get("x_max")
+            x_min = float(x_min) if x_min not in (None, "") else None
+            x_max = float(x_max) if x_max not in (None, "") else None
+        except ValueError as e:
+            return web.json_response({"success": False, "error": str(e)}, status=400)
+
+        # The page may come from disk, so read it off the event loop
+        loop = asyncio.get_running_loop()
+        page = await loop.run_in_executor(
+            None,
+            MF_GraphPlotter.get_series_range,
+            node_id,
+            start,
+            limit,
+            x_min,
+            x_max,
+        )
+
+        return web.json_response({"success": True, **page})
+
+    except Exception as e:
+        return web.json_response({"success": False, "error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.get("/graph_plotter/export")
+async def export_graph_series(request):
+    """
+    API endpoint streaming a Graph Plotter node's full history as CSV or
+    NDJSON, read from disk chunk by chunk off the event loop
+    """
+    node_id = request.query.get("node_id")
+    export_format = request.query.get("format", "csv").lower()
+
+    if not node_id:
+        return web.json_response(
+            {"success": False, "error": "node_id is required"}, status=400
+        )
+    if export_format not in ("csv", "ndjson"):
+        return web.json_response(
+            {"success": False, "error": "format must be csv or ndjson"}, status=400
+        )
+
+    content_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": f"{content_type}; charset=utf-8",
+            "Content-Disposition": (
+                f'attachment; filename="graph_{node_id}.{export_format}"'
+            ),
+        }
+    )
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+    chunks = MF_GraphPlotter.export_chunks(node_id, export_format)
+
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            await response.write(chunk)
+        await response.write_eof()
+    except Exception as e:
+        # Headers are already sent, so the error can only be logged
+        print(f"❌ [MF_GraphPlotter] Export of node {node_id} failed: {e}")
+    finally:
+        chunks.close()
+
+    return response
+
+
+# Size of the chunks streamed from upload bodies to disk
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def _iter_part_chunks(part):
+    """Iterate a multipart body part in chunks"""
+    while True:
+        chunk = await part.read_chunk(_UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _stream_to_temp_file(chunks, directory):
+    """
+    Write an async iterator of byte chunks to a temporary file in directory.
+    All blocking file operations run in the default executor so other
+    HTTP/websocket clients are not stalled. Returns the temporary path.
+    """
+    loop = asyncio.get_running_loop()
+    fd, tmp_path = await loop.run_in_executor(
+        None, lambda: tempfile.mkstemp(suffix=".part", dir=directory)
+    )
+    f = os.fdopen(fd, "wb")
+
+    try:
+        async for chunk in chunks:
+            await loop.run_in_executor(None, f.write, chunk)
+        await loop.run_in_executor(None, f.close)
+    except BaseException:
+        f.close()
+        os.remove(tmp_path)
+        raise
+
+    return tmp_path
+
+
+def _prepare_directory(save_path):
+    """Create the parent directory of save_path, returning it"""
+    directory = os.path.dirname(os.path.abspath(save_path))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _move_into_place(tmp_path, save_path):
+    """Move a finished upload to save_path (overwrites if exists)"""
+    try:
+        shutil.move(tmp_path, save_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_base64_file(image_data, save_path):
+    """Decode base64 image data and write it to save_path"""
+    # Remove data URL prefix if present
+    if image_data.startswith("data:image"):
+        image_data = image_data.split(",")[1]
+
+    image_bytes = base64.b64decode(image_data)
+    _prepare_directory(save_path)
+    with open(save_path, "wb") as f:
+        f.write(image_bytes)
+
+
+@server.PromptServer.instance.routes.post("/graph_plotter/save_image")
+async def save_graph_image(request):
+    """
+    API endpoint to save graph image to user-selected path.
+
+    Accepted bodies:
+    - multipart/form-data with a "save_path" field and an "image" file
+    - raw binary (image/* or application/octet-stream) with ?save_path=...
+    - JSON {"image_data": base64, "save_path": ...} (legacy)
+
+    Binary bodies are streamed to a temporary file in chunks and moved into
+    place; all disk work runs off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+
+    try:
+        if request.content_type == "application/json":
+            data = await request.json()
+            image_data = data.get("image_data")
+            save_path = data.get("save_path")
+
+            if not image_data or not save_path:
+                return web.json_response(
+                    {
+                        "success": False,
+                        "error": "image_data and save_path are required",
+                    },
+                    status=400,
+                )
+
+            await loop.run_in_executor(None, _write_base64_file, image_data, save_path)
+
+        elif request.content_type == "multipart/form-data":
+            save_path = None
+            tmp_path = None
+            reader = await request.multipart()
+
+            try:
+                async for part in reader:
+                    if part.name == "save_path":
+                        save_path = (await part.text()).strip()
+                    elif part.name == "image" and tmp_path is None:
+                        # Stream next to the target when its path is known,
+                        # so the final move is a cheap rename
+                        if save_path:
+                            directory = await loop.run_in_executor(
+                                None, _prepare_directory, save_path
+                            )
+                        else:
+                            directory = tempfile.gettempdir()
+                        tmp_path = await _stream_to_temp_file(
+                            _iter_part_chunks(part), directory
+                        )
 
-        # Decode base64 and save
-        image_bytes = base64.b64decode(image_data)
+                if not tmp_path or not save_path:
+                    return web.json_response(
+                        {
+                            "success": False,
+                            "error": "image and save_path are required",
+                        },
+                        status=400,
+                    )
 
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                await loop.run_in_executor(None, _prepare_directory, save_path)
+                await loop.run_in_executor(None, _move_into_place, tmp_path, save_path)
+                tmp_path = None
+            finally:
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
 
-        # Write file (overwrites if exists)
-        with open(save_path, "wb") as f:
-            f.write(image_bytes)
+        else:
+            save_path = request.query.get("save_path")
+
+            if not save_path or not request.can_read_body:
+                return web.json_response(
+                    {
+                        "success": False,
+                        "error": "image body and save_path are required",
+                    },
+                    status=400,
+                )
+
+            directory = await loop.run_in_executor(None, _prepare_directory, save_path)
+            tmp_path = await _stream_to_temp_file(
+                request.content.iter_chunked(_UPLOAD_CHUNK_SIZE), directory
+            )
+            await loop.run_in_executor(None, _move_into_place, tmp_path, save_path)
 
         print(f"📊 Graph image saved to: {save_path}")
 
@@ -91,10 +404,7 @@ async def reset_story_driver(request):
         randomize_seed = data.get("randomize_seed", True)
 
         # Call the reset method on the node class
-        MF_StoryDriver.reset_project(project_name, randomize_seed)
-
-        # Get updated state
-        state = MF_StoryDriver._state.get(project_name, {"step": 0, "seed": 0})
+        state = MF_StoryDriver.reset_project(project_name, randomize_seed)
 
         return web.json_response(
             {
@@ -107,3 +417,269 @@ async def reset_story_driver(request):
 
     except Exception as e:
         return web.json_response({"success": False, "error": str(e)}, status=500)
+
+
+# ============================================================================
+# LIVE LOG ENDPOINTS
+# ============================================================================
+
+# Minimum delay between two pushes, so bursts of writes are coalesced
+_LOG_PUSH_INTERVAL = 0.25
+# Largest chunk of new log text pushed in one message
+_LOG_PUSH_MAX_CHARS = 64 * 1024
+# inotify events on a log directory: IN_MODIFY, IN_CLOSE_WRITE,
+# IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE
+_INOTIFY_MASK = 0x002 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+
+def _load_inotify():
+    """Bind Linux inotify through ctypes, or return None where unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class _LogWatcher:
+    """
+    Background thread pushing the lines appended to log files to the node
+    widgets subscribed to them. Log directories are watched with inotify
+    where available (so rotation and re-creation are seen), otherwise the
+    files are polled. Pushes are coalesced to one per _LOG_PUSH_INTERVAL.
+    """
+
+    def __init__(self, send, poll_interval=0.5):
+        self.send = send
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self._subscribers = {}  # (node_id, client_id) -> requested path
+        # absolute path -> _read_new_lines position, or None
+        self._positions = {}
+        self._watches = {}  # directory -> inotify watch descriptor
+        self._thread = None
+        self._changed = threading.Event()
+        self._libc = _load_inotify()
+        self._inotify = -1
+        self._wake_pipe = None
+
+        if self._libc is not None:
+            self._inotify = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._inotify >= 0:
+            # Lets a subscription interrupt the select() on the inotify fd
+            self._wake_pipe = os.pipe()
+            for fd in self._wake_pipe:
+                os.set_blocking(fd, False)
+
+    @property
+    def mode(self):
+        return "inotify" if self._inotify >= 0 else "polling"
+
+    def subscribe(self, node_id, client_id, path):
+        """Push the lines appended to a node's log file to client_id"""
+        with self.lock:
+            self._subscribers[(node_id, client_id)] = os.path.abspath(path)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="MF_LogReader-watcher", daemon=True
+                )
+                self._thread.start()
+        self._wake()
+
+    def unsubscribe(self, node_id, client_id):
+        with self.lock:
+            self._subscribers.pop((node_id, client_id), None)
+        self._wake()
+
+    def _wake(self):
+        """Make the watcher thread re-read its subscriptions now"""
+        self._changed.set()
+        if self._wake_pipe is not None:
+            try:
+                os.write(self._wake_pipe[1], b"\0")
+            except BlockingIOError:
+                pass  # Already woken
+
+    def _targets(self):
+        """
+        Map each watched path to its subscribers, dropping disconnected
+        clients. A node's path follows the file it last opened.
+        """
+        sockets = getattr(server.PromptServer.instance, "sockets", None)
+        targets = {}
+
+        with self.lock:
+            for (node_id, client_id), path in list(self._subscribers.items()):
+                if client_id and sockets is not None and client_id not in sockets:
+                    del self._subscribers[(node_id, client_id)]
+                    continue
+                path = MF_LogReader.opened_path(node_id) or path
+                targets.setdefault(path, []).append((node_id, client_id))
+
+        return targets
+
+    def _watch(self, paths):
+        """Start watching new paths (from their current end) and drop old ones"""
+        for path in list(self._positions):
+            if path not in paths:
+                del self._positions[path]
+
+        for path in paths:
+            if path not in self._positions:
+                try:
+                    self._positions[path] = _log_end_position(path)
+                except OSError:
+                    # Not created yet: read it from the start once it is
+                    self._positions[path] = None
+
+        if self._inotify < 0:
+            return
+
+        directories = {os.path.dirname(path) for path in paths}
+        for directory in list(self._watches):
+            if directory not in directories:
+                self._libc.inotify_rm_watch(self._inotify, self._watches.pop(directory))
+        for directory in directories - set(self._watches):
+            wd = self._libc.inotify_add_watch(
+                self._inotify, os.fsencode(directory), _INOTIFY_MASK
+            )
+            if wd >= 0:
+                self._watches[directory] = wd
+
+    def _push(self, targets):
+        """Read each watched file's new lines and send them to subscribers"""
+        for path, subscribers in targets.items():
+            try:
+                text, self._positions[path] = _read_new_lines(
+                    path, self._positions[path]
+                )
+            except OSError:
+                continue
+
+            if not text:
+                continue
+
+            text = text[-_LOG_PUSH_MAX_CHARS:]
+            for node_id, client_id in subscribers:
+                self.send(
+                    "mf_log_update",
+                    {"node_id": node_id, "path": path, "text": text},
+                    client_id,
+                )
+
+    def _wait(self):
+        """Wait for a change in a watched directory, or the poll interval"""
+        if self._inotify < 0:
+            self._changed.wait(self.poll_interval)
+        else:
+            # Files are still checked now and then, e.g. for a directory
+            # created after it was first watched
+            fds = [self._inotify, self._wake_pipe[0]]
+            select.select(fds, [], [], self.poll_interval * 10)
+            for fd in fds:
+                try:
+                    while os.read(fd, 64 * 1024):
+                        pass
+                except BlockingIOError:
+                    pass
+        self._changed.clear()
+
+    def _run(self):
+        while True:
+            targets = self._targets()
+
+            if not targets:
+                with self.lock:
+                    # A subscribe() since _targets() must not be left
+                    # without a thread, so only exit if there still is none
+                    if not self._subscribers:
+                        self._thread = None
+                        self._watch(set())
+                        return
+                continue
+
+            try:
+                self._watch(set(targets))
+                self._push(targets)
+            except Exception as e:
+                print(f"⚠️ [MF_LogReader] Live log update failed: {e}")
+
+            # Coalesce bursts of writes into the next push
+            time.sleep(_LOG_PUSH_INTERVAL)
+            self._wait()
+
+
+def _send_log_update(event, data, client_id):
+    server.PromptServer.instance.send_sync(event, data, client_id)
+
+
+_log_watcher = _LogWatcher(_send_log_update)
+
+
+@server.PromptServer.instance.routes.post("/log_watch/subscribe")
+async def subscribe_log_watch(request):
+    """
+    API endpoint subscribing a MF_LogReader/MF_LogFile widget to the lines
+    appended to its log file, pushed as "mf_log_update" websocket events.
+    Body: {"node_id", "client_id", "log_file_path", "log_file_name"}; the
+    file the node last opened takes precedence over the given path.
+    """
+    try:
+        data = await request.json()
+        node_id = data.get("node_id")
+
+        if not node_id:
+            return web.json_response(
+                {"success": False, "error": "node_id is required"}, status=400
+            )
+
+        node_id = str(node_id)
+        path = MF_LogReader.opened_path(node_id) or _get_log_file_path(
+            data.get("log_file_path"),
+            data.get("log_file_name"),
+            folder_paths.get_output_directory(),
+        )
+        _log_watcher.subscribe(node_id, data.get("client_id"), path)
+
+        return web.json_response(
+            {
+                "success": True,
+                "node_id": node_id,
+                "path": os.path.abspath(path),
+                "mode": _log_watcher.mode,
+            }
+        )
+
+    except Exception as e:
+        return web.json_response({"success": False, "error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.post("/log_watch/unsubscribe")
+async def unsubscribe_log_watch(request):
+    """
+    API endpoint stopping live log updates for a node widget
+    """
+    try:
+        data = await request.json()
+        node_id = data.get("node_id")
+
+        if not node_id:
+            return web.json_response(
+                {"success": False, "error": "node_id is required"}, status=400
+            )
+
+        _log_watcher.unsubscribe(str(node_id), data.get("client_id"))
+
+        return web.json_response({"success": True, "node_id": str(node_id)})
+
+    except Exception as e:
+        return web.json_response({"success": False, "error": str(e)}, status=500)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+import pytest
+
+# The node modules import ComfyUI's folder_paths at load time, so the tests
+# only run from a ComfyUI environment
+pytest.importorskip("folder_paths")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
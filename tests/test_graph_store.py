@@ -0,0 +1,143 @@
+import os
+import threading
+
+import pipo_nodes_integrated as nodes
+
+
+def _wait_for_compactions():
+    for thread in threading.enumerate():
+        if thread.name.startswith("MF_GraphPlotter-compact-"):
+            thread.join()
+
+
+def _chunk_files(node_dir):
+    files = {}
+    for name in os.listdir(node_dir):
+        if name.startswith("chunk-"):
+            stat = os.stat(os.path.join(node_dir, name))
+            files[name] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def test_compaction_cost_stays_bounded(tmp_path):
+    store = nodes._GraphSegmentStore(str(tmp_path))
+    store.SEGMENT_MAX_RECORDS = 100
+    node_dir = store._node_dir("n")
+
+    read_points = []
+    read_segment = store._read_segment
+    read_chunk = store._read_chunk
+
+    def counting_read_segment(path, node_data):
+        before = len(node_data["x_data"])
+        read_segment(path, node_data)
+        read_points.append(len(node_data["x_data"]) - before)
+
+    def failing_read_chunk(path):
+        raise AssertionError(f"compaction read chunk {path}")
+
+    store._read_segment = counting_read_segment
+    store._read_chunk = failing_read_chunk
+
+    max_merge = store.COMPACT_MIN_SEGMENTS * store.SEGMENT_MAX_RECORDS
+    for batch in range(200):
+        before = _chunk_files(node_dir) if os.path.isdir(node_dir) else {}
+        read_points.clear()
+
+        x_values = list(range(batch * 100, batch * 100 + 100))
+        store.append("n", x_values, {"Y": [float(x) for x in x_values]}, 0.0)
+        _wait_for_compactions()
+
+        # A compaction only reads the segments it merges, never older
+        # history, and leaves every existing chunk untouched
+        assert sum(read_points) <= max_merge
+        after = _chunk_files(node_dir)
+        for name, stat in before.items():
+            assert after[name] == stat
+        assert len(after) - len(before) <= 1
+
+    assert len(_chunk_files(node_dir)) >= 40
+
+    store._read_segment = read_segment
+    store._read_chunk = read_chunk
+    node_data = store.load("n")
+    assert node_data["x_data"] == list(range(20000))
+    assert node_data["series"]["Y"][-1] == 19999.0
+
+
+def test_bounded_load_reads_only_recent_chunks(tmp_path):
+    store = nodes._GraphSegmentStore(str(tmp_path))
+    store.SEGMENT_MAX_RECORDS = 100
+    for batch in range(100):
+        x_values = list(range(batch * 100, batch * 100 + 100))
+        store.append("n", x_values, {"Y": [float(x) for x in x_values]}, 0.0)
+        _wait_for_compactions()
+
+    chunks_read = []
+    read_chunk = store._read_chunk
+
+    def counting_read_chunk(path):
+        chunks_read.append(path)
+        return read_chunk(path)
+
+    store._read_chunk = counting_read_chunk
+    node_data = store.load("n", keep_last_n=500)
+    assert node_data["x_data"] == list(range(9500, 10000))
+    assert len(chunks_read) <= 2
+
+
+def test_legacy_snapshot_is_split_for_bounded_loads(tmp_path):
+    store = nodes._GraphSegmentStore(str(tmp_path))
+    node_dir = store._node_dir("n")
+    os.makedirs(node_dir)
+    with open(os.path.join(node_dir, store._snapshot_name(3)), "w") as f:
+        nodes.json.dump(
+            {
+                "x_data": list(range(50000)),
+                "t_data": [0.0] * 50000,
+                "series": {"Y": [float(x) for x in range(50000)]},
+            },
+            f,
+        )
+
+    store.collect_garbage()
+    assert not os.path.exists(os.path.join(node_dir, store._snapshot_name(3)))
+
+    chunks_read = []
+    read_chunk = store._read_chunk
+
+    def counting_read_chunk(path):
+        chunks_read.append(path)
+        return read_chunk(path)
+
+    store._read_chunk = counting_read_chunk
+    assert store.load("n", keep_last_n=100)["x_data"] == list(range(49900, 50000))
+    assert len(chunks_read) == 1
+    assert store.load("n")["x_data"] == list(range(50000))
+
+
+def test_retention_is_saved_per_node(tmp_path):
+    store = nodes._GraphSegmentStore(str(tmp_path))
+    store.set_retention("n", 100, 0)
+    assert nodes._GraphSegmentStore(str(tmp_path)).retention("n") == (100, 0)
+    store.reset("n")
+    assert store.retention("n") == (0, 0)
+
+
+def test_startup_gc_leaves_few_closed_segments_alone(tmp_path):
+    for restart in range(3):
+        store = nodes._GraphSegmentStore(str(tmp_path))
+        store.append("n", [restart], {"Y": [1.0]}, 0.0)
+        before = {
+            name: os.stat(os.path.join(store._node_dir("n"), name)).st_mtime_ns
+            for name in os.listdir(store._node_dir("n"))
+        }
+
+        result = nodes._GraphSegmentStore(str(tmp_path)).collect_garbage()
+        assert result["compacted"] == []
+        assert result["bytes_reclaimed"] == 0
+        after = {
+            name: os.stat(os.path.join(store._node_dir("n"), name)).st_mtime_ns
+            for name in os.listdir(store._node_dir("n"))
+        }
+        assert after == before
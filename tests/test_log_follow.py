@@ -0,0 +1,50 @@
+import json
+import os
+import time
+
+import pipo_nodes_integrated as nodes
+
+
+def _wait_compressed(path):
+    deadline = time.time() + 10
+    while time.time() < deadline and any(
+        not segment.endswith(".gz") for segment in nodes._rotated_log_segments(path)
+    ):
+        time.sleep(0.01)
+
+
+def test_follow_reads_across_compressed_rotation(tmp_path):
+    node = nodes.MF_LogFile()
+    options = {
+        "save_log_path": str(tmp_path),
+        "log_file_name": "run",
+        "output_mode": "new_entry",
+        "durability": "flush",
+        "rotation": "size",
+        "max_size_kb": 1,
+        "keep_segments": 0,
+        "compression": "gzip",
+        "log_format": "jsonl",
+    }
+    path = os.path.join(str(tmp_path), "run.jsonl")
+
+    node.write_log("e0", **options)
+    text, position = nodes._read_new_lines(path)
+    lines = text.splitlines()
+
+    for i in range(1, 60):
+        node.write_log(f"e{i}", **options)
+        if i % 5 == 0:
+            # Segments are compressed before the follower catches up
+            _wait_compressed(path)
+            text, position = nodes._read_new_lines(path, position)
+            lines += text.splitlines()
+
+    _wait_compressed(path)
+    text, position = nodes._read_new_lines(path, position)
+    lines += text.splitlines()
+
+    assert len(nodes._rotated_log_segments(path)) >= 5
+    assert [json.loads(line)["payload"] for line in lines] == [
+        f"e{i}" for i in range(60)
+    ]
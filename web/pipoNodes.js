@@ -18,6 +18,90 @@ const loadChartJS = () => {
   })
 }
 
+// Line colors for Graph Plotter series, in slot order (Y, Y2, Y3, Y4)
+const GRAPH_SERIES_COLORS = ['#FFEC00', '#4E9FFF', '#88FF88', '#FF6B6B']
+const GRAPH_SERIES_KEYS = ['Y', 'Y2', 'Y3', 'Y4']
+
+// Build a Chart.js dataset for one Graph Plotter series
+const createSeriesDataset = (key, label) => {
+  const index = Math.max(GRAPH_SERIES_KEYS.indexOf(key), 0)
+  const color = GRAPH_SERIES_COLORS[index % GRAPH_SERIES_COLORS.length]
+  return {
+    seriesKey: key,
+    label,
+    data: [],
+    borderColor: color,
+    backgroundColor: color + '26', // ~15% opacity fill
+    borderWidth: 2,
+    fill: index === 0,
+    pointRadius: 5,
+    pointBackgroundColor: color,
+    pointBorderColor: '#ffffff',
+    pointBorderWidth: 2,
+    pointHoverRadius: 7,
+    spanGaps: true,
+    tension: 0.4 // Smooth curves
+  }
+}
+
+// Keep at most this many characters in a live log display
+const LIVE_LOG_MAX_CHARS = 200000
+
+// Subscribe (or unsubscribe) a log node's display to the lines the server
+// pushes as they are appended to its log file
+const setLiveLog = async (node, enabled) => {
+  const pathWidget = node.widgets?.find(
+    (w) => w.name === 'log_file_path' || w.name === 'save_log_path'
+  )
+  const nameWidget = node.widgets?.find((w) => w.name === 'log_file_name')
+
+  try {
+    const response = await api.fetchApi(
+      enabled ? '/log_watch/subscribe' : '/log_watch/unsubscribe',
+      {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+          node_id: String(node.id),
+          client_id: api.clientId,
+          log_file_path: pathWidget?.value,
+          log_file_name: nameWidget?.value
+        })
+      }
+    )
+
+    if (response.ok) {
+      const data = await response.json()
+      node.liveLog = enabled
+      if (node.liveLogButton) {
+        node.liveLogButton.name = enabled ? '📡 Live: On' : '📡 Live: Off'
+        node.setDirtyCanvas?.(true)
+      }
+      if (enabled) {
+        console.log(`📡 Live log: ${data.path} (${data.mode})`)
+      }
+    } else {
+      console.error('Failed to toggle live log:', await response.text())
+    }
+  } catch (error) {
+    console.error('Error toggling live log:', error)
+  }
+}
+
+// Append pushed log lines to a node's display, scrolled to the end
+const appendLiveLog = (node, text) => {
+  const widget = node.widgets?.find((w) => w.name === 'log_display')
+
+  if (widget) {
+    widget.value = (widget.value + text).slice(-LIVE_LOG_MAX_CHARS)
+    if (widget.inputEl) {
+      widget.inputEl.scrollTop = widget.inputEl.scrollHeight
+    }
+  }
+}
+
 app.registerExtension({
   name: 'MF.PipoNodes',
 
@@ -29,6 +113,14 @@ app.registerExtension({
     } catch (error) {
       console.error('Failed to load Chart.js:', error)
     }
+
+    // Live log lines pushed by the server log watcher
+    api.addEventListener('mf_log_update', ({ detail }) => {
+      const node = app.graph?.getNodeById(detail.node_id)
+      if (node?.liveLog) {
+        appendLiveLog(node, detail.text)
+      }
+    })
   },
 
   async beforeRegisterNodeDef (nodeType, nodeData, app) {
@@ -69,14 +161,28 @@ app.registerExtension({
     }
 
     // ====================================================================
-    // LOG FILE
+    // LOG FILE / LOG READER / LOG SEARCH / LOG QUERY
     // ====================================================================
-    if (nodeData.name === 'MF_LogFile') {
+    if (['MF_LogFile', 'MF_LogReader', 'MF_LogSearch', 'MF_LogQuery'].includes(nodeData.name)) {
       const onNodeCreated = nodeType.prototype.onNodeCreated
 
       nodeType.prototype.onNodeCreated = function () {
         const r = onNodeCreated?.apply(this, arguments)
 
+        // Add live update toggle
+        this.liveLog = false
+        if (nodeData.name === 'MF_LogFile' || nodeData.name === 'MF_LogReader') {
+          this.liveLogButton = this.addWidget(
+            'button',
+            '📡 Live: Off',
+            null,
+            () => {
+              setLiveLog(this, !this.liveLog)
+            },
+            { serialize: false }
+          )
+        }
+
         const widget = ComfyWidgets.STRING(
           this,
           'log_display',
@@ -88,7 +194,12 @@ app.registerExtension({
         widget.inputEl.style.opacity = 0.6
         widget.inputEl.style.fontFamily = 'monospace'
         widget.inputEl.style.fontSize = '12px'
-        widget.value = '📝 Log file content will appear here...'
+        widget.value = {
+          MF_LogFile: '📝 Log file content will appear here...',
+          MF_LogReader: '📖 Log file content will appear here...',
+          MF_LogSearch: '🔎 Matching lines will appear here...',
+          MF_LogQuery: '🔎 Matching records will appear here...'
+        }[nodeData.name]
 
         widget.inputEl.style.height = '150px'
         widget.inputEl.style.maxHeight = '150px'
@@ -107,6 +218,16 @@ app.registerExtension({
           widget.value = message.log_display[0]
         }
       }
+
+      // Stop live updates when the node is removed
+      const onRemoved = nodeType.prototype.onRemoved
+
+      nodeType.prototype.onRemoved = function () {
+        if (this.liveLog) {
+          setLiveLog(this, false)
+        }
+        return onRemoved?.apply(this, arguments)
+      }
     }
 
     // ====================================================================
@@ -197,6 +318,10 @@ app.registerExtension({
         this.graphNodeId = this.id
         console.log(`📊 Graph Plotter node created with ID: ${this.graphNodeId}`)
 
+        // Sequence number of the last delta applied to the chart
+        // (null until the first full resync)
+        this.graphSeq = null
+
         // Add reset button
         this.addWidget(
           'button',
@@ -244,12 +369,44 @@ app.registerExtension({
         this.graphCanvas = canvas
         this.canvasWidget = canvasWidget
 
+        // Running statistics display (count, min, max, mean, variance, p50, p95)
+        const statsWidget = ComfyWidgets.STRING(
+          this,
+          'stats_display',
+          ['STRING', { multiline: true }],
+          app
+        ).widget
+
+        statsWidget.inputEl.readOnly = true
+        statsWidget.inputEl.style.opacity = 0.6
+        statsWidget.inputEl.style.fontFamily = 'monospace'
+        statsWidget.inputEl.style.fontSize = '11px'
+        statsWidget.inputEl.style.height = '60px'
+        statsWidget.inputEl.style.maxHeight = '60px'
+        statsWidget.value = '📈 Statistics will appear here...'
+
         // Initialize Chart.js chart
         this.initChart()
 
         return r
       }
 
+      // Show running statistics, one line per series
+      nodeType.prototype.updateStatsDisplay = function (stats, labels) {
+        const widget = this.widgets?.find((w) => w.name === 'stats_display')
+        if (!widget || !stats) {
+          return
+        }
+
+        const fmt = (value) => Number(value).toPrecision(4)
+        const lines = GRAPH_SERIES_KEYS.filter((key) => key in stats).map((key) => {
+          const s = stats[key]
+          return `${labels?.[key] || key}: n=${s.count} min=${fmt(s.min)} max=${fmt(s.max)} ` +
+            `mean=${fmt(s.mean)} var=${fmt(s.variance)} p50=${fmt(s.p50)} p95=${fmt(s.p95)}`
+        })
+        widget.value = lines.length > 0 ? lines.join('\n') : '📈 No data'
+      }
+
       // Initialize Chart.js instance
       nodeType.prototype.initChart = function () {
         if (!window.Chart || !this.graphCanvas) {
@@ -298,20 +455,7 @@ app.registerExtension({
             type: 'line',
             data: {
               labels: [],
-              datasets: [{
-                label: 'Y Values',
-                data: [],
-                borderColor: '#FFEC00',
-                backgroundColor: 'rgba(255, 236, 0, 0.15)',
-                borderWidth: 2,
-                fill: true,
-                pointRadius: 5,
-                pointBackgroundColor: '#FFEC00',
-                pointBorderColor: '#ffffff',
-                pointBorderWidth: 2,
-                pointHoverRadius: 7,
-                tension: 0.4 // Smooth curves
-              }]
+              datasets: []
             },
             options: {
               responsive: true,
@@ -321,7 +465,10 @@ app.registerExtension({
               },
               plugins: {
                 legend: {
-                  display: false
+                  display: false, // Shown once there is more than one series
+                  labels: {
+                    color: '#ffffff'
+                  }
                 },
                 tooltip: {
                   enabled: true,
@@ -335,11 +482,11 @@ app.registerExtension({
                       return ''
                     },
                     label: function (context) {
-                      const xValue = context.parsed.x
+                      const xValue = context.label
                       const yValue = context.parsed.y
                       return [
                         'X = ' + xValue,
-                        'Y = ' + yValue
+                        context.dataset.label + ' = ' + yValue
                       ]
                     }
                   },
@@ -397,8 +544,33 @@ app.registerExtension({
         }
       }
 
+      // Make sure there is one dataset per series, in slot order
+      nodeType.prototype.syncDatasets = function (series, labels) {
+        const datasets = this.chart.data.datasets
+        const pointCount = this.chart.data.labels.length
+
+        for (const key of GRAPH_SERIES_KEYS) {
+          if (!(key in series)) {
+            continue
+          }
+          let dataset = datasets.find(d => d.seriesKey === key)
+          if (!dataset) {
+            dataset = createSeriesDataset(key, key)
+            // Series that start later are padded so they stay aligned on X
+            dataset.data = new Array(pointCount).fill(null)
+            datasets.push(dataset)
+            datasets.sort((a, b) =>
+              GRAPH_SERIES_KEYS.indexOf(a.seriesKey) - GRAPH_SERIES_KEYS.indexOf(b.seriesKey)
+            )
+          }
+          dataset.label = labels?.[key] || key
+        }
+
+        this.chart.options.plugins.legend.display = datasets.length > 1
+      }
+
       // Update chart with new data
-      nodeType.prototype.updateChart = function (xValues, yValues) {
+      nodeType.prototype.updateChart = function (xValues, series, labels) {
         if (!this.chart) {
           console.warn('⚠️ Chart not initialized')
           return
@@ -407,13 +579,103 @@ app.registerExtension({
         try {
           // Update chart data
           this.chart.data.labels = xValues
-          this.chart.data.datasets[0].data = yValues
+          this.chart.data.datasets = []
+          this.syncDatasets(series, labels)
+          for (const dataset of this.chart.data.datasets) {
+            dataset.data = series[dataset.seriesKey]
+          }
           this.chart.update()
         } catch (error) {
           console.error('Error updating chart:', error)
         }
       }
 
+      // Append delta points to the chart without rebuilding it
+      // (keepCount: number of points retained by the server, oldest dropped first).
+      // Returns false when the points could not be appended.
+      nodeType.prototype.appendChartPoints = function (xValues, series, keepCount, labels) {
+        if (!this.chart || this._isBeingRemoved) {
+          return false
+        }
+
+        try {
+          this.syncDatasets(series, labels)
+
+          // Append one by one: spreading a large batch into push() exceeds
+          // the engine's argument limit
+          const labelsArray = this.chart.data.labels
+          for (const x of xValues) {
+            labelsArray.push(x)
+          }
+          for (const dataset of this.chart.data.datasets) {
+            const values = series[dataset.seriesKey]
+            for (let i = 0; i < xValues.length; i++) {
+              dataset.data.push(values ? values[i] : null)
+            }
+          }
+
+          const excess = labelsArray.length - keepCount
+          if (excess > 0) {
+            labelsArray.splice(0, excess)
+            for (const dataset of this.chart.data.datasets) {
+              dataset.data.splice(0, excess)
+            }
+          }
+          this.chart.update()
+          return true
+        } catch (error) {
+          console.error('Error appending to chart:', error)
+          return false
+        }
+      }
+
+      // Fetch the full history from the server and rebuild the chart
+      nodeType.prototype.resyncGraph = async function () {
+        if (this._graphResyncing || this._isBeingRemoved) {
+          return
+        }
+        this._graphResyncing = true
+
+        try {
+          const nodeId = encodeURIComponent(String(this.graphNodeId || this.id))
+          const maxPointsWidget = this.widgets?.find(w => w.name === 'max_display_points')
+          const maxPoints = maxPointsWidget ? maxPointsWidget.value : 0
+          const namesWidget = this.widgets?.find(w => w.name === 'series_names')
+          const seriesNames = encodeURIComponent(namesWidget ? namesWidget.value : '')
+          // Retention bounds what the server loads from disk for this node
+          const keepWidget = this.widgets?.find(w => w.name === 'keep_last_n')
+          const maxAgeWidget = this.widgets?.find(w => w.name === 'max_age_seconds')
+          const retention = (keepWidget ? `&keep_last_n=${keepWidget.value}` : '') +
+            (maxAgeWidget ? `&max_age_seconds=${maxAgeWidget.value}` : '')
+          const response = await api.fetchApi(
+            `/graph_plotter/data?node_id=${nodeId}&max_points=${maxPoints}&series_names=${seriesNames}${retention}`
+          )
+
+          if (response.ok) {
+            const data = await response.json()
+            this.graphSeq = data.seq
+            this.updateChart(data.x_values, data.series, data.labels)
+            this.updateStatsDisplay(data.stats, data.labels)
+            console.log(`📊 Graph resynced: ${data.point_count} points`)
+          } else {
+            console.error('Failed to resync graph:', await response.text())
+          }
+        } catch (error) {
+          console.error('Error resyncing graph:', error)
+        } finally {
+          this._graphResyncing = false
+        }
+      }
+
+      // Load the stored history once the workflow has assigned the node ID
+      const onConfigure = nodeType.prototype.onConfigure
+      nodeType.prototype.onConfigure = function () {
+        const r = onConfigure?.apply(this, arguments)
+        this.graphNodeId = this.id
+        this.resyncGraph()
+        return r
+      }
+
       // Save graph with file dialog
       nodeType.prototype.saveGraphWithDialog = async function () {
         if (!this.chart || !this.graphCanvas) {
@@ -505,10 +767,14 @@ app.registerExtension({
           })
 
           if (response.ok) {
+            const data = await response.json()
+            this.graphSeq = data.seq
+
             // Clear the chart immediately and force update
             if (this.chart) {
               this.chart.data.labels = []
-              this.chart.data.datasets[0].data = []
+              this.chart.data.datasets = []
+              this.updateStatsDisplay({}, {})
               this.chart.update('none') // Update without animation
             }
 
@@ -546,10 +812,33 @@ app.registerExtension({
             return
           }
 
+          this.updateStatsDisplay(data.stats, data.labels)
+
           // Update chart - but check if still valid
           if (this && this.chart && !this._isBeingRemoved) {
-            this.updateChart(data.x_values, data.y_values)
-            console.log(`📊 Graph updated: ${data.point_count} points`)
+            // A resync in flight already covers this delta
+            if (this._graphResyncing) {
+              return
+            }
+
+            const chartLength = this.chart.data.labels.length
+            if (data.downsampled) {
+              // Server sent a complete downsampled view: replace the chart
+              this.graphSeq = data.seq
+              this.updateChart(data.x_values, data.series, data.labels)
+              console.log(`📊 Graph updated: ${data.point_count} points (${data.x_values.length} shown)`)
+            } else if (this.graphSeq !== null && data.seq === this.graphSeq + 1 && data.offset <= chartLength) {
+              if (this.appendChartPoints(data.x_values, data.series, data.point_count, data.labels)) {
+                this.graphSeq = data.seq
+                console.log(`📊 Graph updated: ${data.point_count} points`)
+              } else {
+                // The chart may be partly updated: rebuild it from the server
+                this.resyncGraph()
+              }
+            } else {
+              // Missed an update (or first execution): fetch full history
+              this.resyncGraph()
+            }
           }
         }
       }
@@ -656,13 +945,13 @@ app.registerExtension({
 
       // Override methods to check if node is being removed
       const originalUpdateChart = nodeType.prototype.updateChart
-      nodeType.prototype.updateChart = function (xValues, yValues) {
+      nodeType.prototype.updateChart = function (xValues, series, labels) {
         if (this && this._isBeingRemoved) {
           console.log('⚠️ Skipping updateChart - node being removed')
           return
         }
         if (originalUpdateChart) {
-          return originalUpdateChart.call(this, xValues, yValues)
+          return originalUpdateChart.call(this, xValues, series, labels)
         }
       }
 